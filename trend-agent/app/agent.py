@@ -1,35 +1,43 @@
-import vertexai
-from dotenv import load_dotenv
-
 from google.adk.agents import LlmAgent
-from google.adk.tools import FunctionTool, agent_tool
-from vertexai.preview import reasoning_engines
+from google.adk.tools import FunctionTool
 
 # Import components from our new modular structure
 from .config import settings
+from .tracing import configure_tracing
 from .tools import (
     classify_topic,
     check_report_for_verification,
     submit_report_for_verification,
     save_report_formats,
+    research_topic,
 )
 from .callbacks import check_review_status, save_review_id
-from .subagents import research_agent
-from .auth_tools import authenticate_google_services
-
-# Initialize Vertex AI
-load_dotenv()
-vertexai.init(
-    project=settings.GOOGLE_CLOUD_PROJECT,
-    location=settings.GOOGLE_CLOUD_LOCATION,
-    staging_bucket=settings.STAGING_BUCKET,
-)
+from .delivery import ReportDeliveryAgent
+from .research import research_agent_tool
+from .auth_tool import authenticate_google_services
+
+configure_tracing()
+
+# Step 3 of the instruction depends on how research runs (RESEARCH_MODE).
+RESEARCH_STEPS = {
+    "fanout": """3.  **DELEGATE RESEARCH (INTERNAL STEP):** You MUST use the `research_topic` tool to gather information. Split the user's topic into 3-6 focused search queries that each cover a different angle, and pass them all in a single call. For example, if the topic is "EV market", your queries could be "electric vehicle market size and growth 2024", "electric vehicle consumer adoption trends", "EV battery and charging technology trends" and "leading electric vehicle makers by market share".""",
+    "single": """3.  **DELEGATE RESEARCH (INTERNAL STEP):** You MUST use the `research_agent` to gather information. Formulate a clear and specific query for the assistant based on the user's topic. For example, if the topic is "EV market", your query should be "latest trends in the electric vehicle market 2024".""",
+}
+
+if settings.RESEARCH_MODE == "fanout":
+    research_tool = FunctionTool(func=research_topic)
+else:
+    research_tool = research_agent_tool
+
+# With streamed delivery, ReportDeliveryAgent becomes the root and this agent
+# its sub-agent, so the names must differ.
+STREAM_DELIVERY = settings.APPROVED_REPORT_DELIVERY == "stream"
 
 # Define the main supervisor agent
-root_agent = LlmAgent(
-    name=settings.AGENT_NAME,
+analyst_agent = LlmAgent(
+    name=f"{settings.AGENT_NAME}_analyst" if STREAM_DELIVERY else settings.AGENT_NAME,
     model=settings.MODEL_NAME,
-    instruction="""
+    instruction=f"""
         You are a Market Research Analyst for Cymbal (a multinational market research and consulting firm). Your job is to manage a secure workflow to create market reports.
         You MUST NOT show the report text to the user until it is fully approved and saved.
 
@@ -41,9 +49,9 @@ root_agent = LlmAgent(
         
         2.  **Classify Topic:** Once the user provides a topic, call the `classify_topic` tool. If 'sensitive', inform the user you cannot proceed and stop. If 'safe', inform the user "Thank you. I will now delegate research on this topic to my assistant." Then, proceed.
 
-        3.  **DELEGATE RESEARCH (INTERNAL STEP):** You MUST use the `research_agent` to gather information. Formulate a clear and specific query for the assistant based on the user's topic. For example, if the topic is "EV market", your query should be "latest trends in the electric vehicle market 2024".
+        {RESEARCH_STEPS[settings.RESEARCH_MODE]}
 
-        4.  **SILENT INTERNAL PROCESSING:** After the `research_agent` returns its findings, you MUST enter a silent processing mode. **DO NOT generate any text for the user.** Your only goal is to process the information and continue the workflow by calling the next required tool.
+        4.  **SILENT INTERNAL PROCESSING:** After the research tool returns its findings, you MUST enter a silent processing mode. **DO NOT generate any text for the user.** Your only goal is to process the information and continue the workflow by calling the next required tool.
 
         5.  **DRAFT AND VERIFY (IMMEDIATE NEXT STEP):** Your very next action, without any user communication, MUST be to use the research findings to write the full draft report and immediately call the `check_report_for_verification` tool with that draft. These two actions (writing and calling the tool) are a single, silent step.
 
@@ -53,23 +61,38 @@ root_agent = LlmAgent(
 
         7.  **Handle Human Review:** If a report was sent for review, the system will provide an update via a system message. Follow the instructions provided in that system message precisely.
 
-        8.  **Final Delivery:** After a successful `save_report_formats` call, your final response to the user MUST be to first **present the complete and final report text**. Then, provide the `gcs_urls` and `drive_urls` from the tool's output.
+        8.  **Final Delivery:** After a successful `save_report_formats` call, your final response to the user MUST be to first **present the complete and final report text** (use `report_text` from the tool's output when it is present). Then, provide the `gcs_urls` and `drive_urls` from the tool's output. If the status is `partial_success`, also tell the user which uploads listed under `errors` failed.
     """,
     tools=[
         FunctionTool(func=authenticate_google_services),
         FunctionTool(func=classify_topic),
-        agent_tool.AgentTool(agent=research_agent),
+        research_tool,
         FunctionTool(func=check_report_for_verification),
         FunctionTool(func=submit_report_for_verification),
         FunctionTool(func=save_report_formats),
     ],
     before_model_callback=check_review_status,
     after_tool_callback=save_review_id,
+    # Under ReportDeliveryAgent there is no other agent to hand off to.
+    disallow_transfer_to_parent=STREAM_DELIVERY,
 )
 
+if STREAM_DELIVERY:
+    root_agent = ReportDeliveryAgent(
+        name=settings.AGENT_NAME,
+        description="Market report workflow with streamed delivery.",
+        sub_agents=[analyst_agent],
+    )
+else:
+    root_agent = analyst_agent
+
 # # For ADK web compatibility
 # agent = root_agent
 
+# from vertexai.preview import reasoning_engines
+# from .config import init_vertexai
+#
+# init_vertexai()
 # app = reasoning_engines.AdkApp(
 #     agent=root_agent,
 #     enable_tracing=True,
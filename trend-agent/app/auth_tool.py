@@ -1,17 +1,56 @@
 import json
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Optional, Tuple
 
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google.adk.auth import AuthConfig, AuthCredential, AuthCredentialTypes, OAuth2Auth
 from google.adk.tools import ToolContext
 from fastapi.openapi.models import OAuth2, OAuthFlowAuthorizationCode, OAuthFlows
 
 from .config import settings
+from .credential_cache import get_credential_cache
+from .tracing import traced
 
 # A key to store the full credential object (with refresh token) in the session state for local dev
 GOOGLE_TOKENS_KEY = "google_tool_tokens"
 
+_prewarm_started = threading.Event()
+
+
+def _prewarm_google_clients() -> None:
+    # Imported here so the Google API client stack stays off the import path.
+    from .google_clients import prewarm
+
+    prewarm()
+
+
+def _start_prewarm() -> None:
+    """Loads the Google API clients in the background once per process."""
+    if not _prewarm_started.is_set():
+        _prewarm_started.set()
+        threading.Thread(
+            target=_prewarm_google_clients, name="google-clients-prewarm", daemon=True
+        ).start()
+
+
+def context_session(tool_context: ToolContext) -> Any:
+    """
+    The ADK session a tool runs in. Newer ADK releases expose it as
+    `ToolContext.session`; google-adk 1.12 (pinned) has no public accessor,
+    so only then is it read from the invocation context.
+    """
+    session = getattr(tool_context, "session", None)
+    if session is None:
+        session = tool_context._invocation_context.session
+    return session
+
+
+def _session_key(tool_context: ToolContext) -> Tuple[str, str]:
+    session = context_session(tool_context)
+    return session.user_id, session.id
+
+
+@traced()
 def authenticate_google_services(tool_context: ToolContext) -> Dict[str, Any]:
     """
     Establishes and verifies authentication with Google services for the current session.
@@ -22,6 +61,8 @@ def authenticate_google_services(tool_context: ToolContext) -> Dict[str, Any]:
     creds = get_authenticated_credentials(tool_context, initiate_auth_flow=True)
 
     if creds and creds.valid:
+        # Gmail/Drive are used later in this session; get them ready meanwhile.
+        _start_prewarm()
         return {"status": "success", "message": "Authentication is active."}
     else:
         # This case is triggered when we are waiting for the user to complete the pop-up flow locally.
@@ -55,31 +96,33 @@ def get_authenticated_credentials(
         if agentspace_token_key in tool_context.state:
             print(f"✅ Using Agentspace token from state key: '{agentspace_token_key}'")
             access_token = tool_context.state[agentspace_token_key]
-            return Credentials(token=access_token, scopes=settings.SCOPES)
+            return get_credential_cache().get(
+                _session_key(tool_context),
+                ("agentspace", access_token),
+                lambda: Credentials(token=access_token, scopes=settings.SCOPES),
+            )
 
     # --- Priority 2: Locally stored tokens (from a previous pop-up login) ---
     # This block handles local development, allowing the agent to reuse credentials within a session.
+    # The cache refreshes these before they expire; see CredentialCache.
     if GOOGLE_TOKENS_KEY in tool_context.state:
+        tokens = tool_context.state[GOOGLE_TOKENS_KEY]
         try:
-            creds = Credentials.from_authorized_user_info(
-                tool_context.state[GOOGLE_TOKENS_KEY], settings.SCOPES
+            creds = get_credential_cache().get(
+                _session_key(tool_context),
+                ("local", tokens.get("refresh_token")),
+                lambda: Credentials.from_authorized_user_info(tokens, settings.SCOPES),
             )
         except Exception as e:
-            print(f"⚠️ Could not load local credentials from state: {e}.")
-            creds = None
-
-    # Refresh if needed (for local dev tokens)
-    if creds and not creds.valid and creds.expired and creds.refresh_token:
-        print("...Refreshing expired local credentials...")
-        try:
-            creds.refresh(Request())
-            tool_context.state[GOOGLE_TOKENS_KEY] = json.loads(creds.to_json())
-        except Exception as e:
-            print(f"❌ Failed to refresh credentials: {e}")
+            print(f"❌ Could not load or refresh local credentials: {e}")
+            get_credential_cache().invalidate(_session_key(tool_context))
             creds = None
 
     if creds and creds.valid:
         print("✅ Using valid, existing local credentials.")
+        if creds.token != tokens.get("token"):
+            # Persist a refresh so the session survives a process restart.
+            tool_context.state[GOOGLE_TOKENS_KEY] = json.loads(creds.to_json())
         return creds
 
     # --- Priority 3 (Optional): Initiate the full OAuth pop-up flow ---
@@ -105,7 +148,9 @@ def get_authenticated_credentials(
         )
         tool_context.state[GOOGLE_TOKENS_KEY] = json.loads(creds.to_json())
         print("✅ Local authentication successful! Tokens stored.")
-        return creds
+        return get_credential_cache().get(
+            _session_key(tool_context), ("local", creds.refresh_token), lambda: creds
+        )
     else:
         print("...Requesting new credentials from user via pop-up...")
         tool_context.request_credential(auth_config)
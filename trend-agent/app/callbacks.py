@@ -1,4 +1,3 @@
-import requests
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.models import LlmRequest, LlmResponse
 from google.adk.tools import BaseTool, ToolContext
@@ -7,9 +6,13 @@ from google.genai import types
 from typing import Optional, Dict, Any
 
 from .config import settings
+from .research import research_tool_name
+from .review_client import ReviewServiceError, get_async_review_client
+from .tracing import traced
 
 
-def check_review_status(
+@traced()
+async def check_review_status(
     callback_context: CallbackContext, llm_request: LlmRequest
 ) -> Optional[LlmResponse]:
     state = callback_context.state
@@ -17,13 +20,13 @@ def check_review_status(
     if not report_review_id:
         return None
     try:
-        response = requests.get(
-            f"{settings.REVIEW_APP_BASE_URL}/reviews/{report_review_id}/status"
+        # Long-poll: the review app answers as soon as a decision is recorded,
+        # so one request per turn replaces repeated status polling.
+        review_data = await get_async_review_client().wait_for_decision(
+            report_review_id, settings.REVIEW_WAIT_TIMEOUT_SECONDS
         )
-        response.raise_for_status()
-        review_data = response.json()
         status = review_data.get("status")
-    except requests.RequestException as e:
+    except ReviewServiceError as e:
         return LlmResponse(
             content=types.Content(
                 parts=[
@@ -44,19 +47,52 @@ def check_review_status(
     state[settings.REPORT_REVIEW_ID_KEY] = None
     comment = review_data.get("comment")
     final_report_text = review_data.get("outline")
-    if status == "approved":
+    # A rewrite after disapproval is uploaded as a revision of this review.
+    state[settings.REPORT_PARENT_REVIEW_KEY] = (
+        {"review_id": report_review_id, "outline": final_report_text}
+        if status == "disapproved"
+        else None
+    )
+    if status == "approved" and settings.APPROVED_REPORT_DELIVERY == "stream":
+        # ReportDeliveryAgent takes over once this turn ends.
+        state[settings.REPORT_DELIVERY_KEY] = {
+            "review_id": report_review_id,
+            "outline": final_report_text,
+        }
+        return LlmResponse(
+            content=types.Content(
+                parts=[
+                    types.Part(
+                        text=f"The reviewer approved the report. Their comment was: '{comment if comment else 'No comment.'}'"
+                    )
+                ]
+            )
+        )
+    if status == "approved" and settings.APPROVED_REPORT_DELIVERY == "reference":
+        # The text stays out of the prompt; save_report_formats reads it back
+        # from state (or the review service) by review ID.
+        state[settings.APPROVED_REPORT_KEY] = {
+            "review_id": report_review_id,
+            "outline": final_report_text,
+        }
+        system_message = f"SYSTEM: The user has APPROVED the report. Their comment was: '{comment if comment else 'No comment.'}' You must now finalize the report. Call the `save_report_formats` tool with `review_id` set to '{report_review_id}' and a suitable title. Do NOT pass `report_markdown`; the tool loads the approved text itself."
+        llm_request.contents.append(
+            types.Content(parts=[types.Part(text=system_message)], role="user")
+        )
+    elif status == "approved":
         system_message = f"SYSTEM: The user has APPROVED the report. Their comment was: '{comment if comment else 'No comment.'}' You must now finalize the report. Call the `save_report_formats` tool with this final approved text and a suitable title. The final text is:\n\n---\n{final_report_text}\n---"
         llm_request.contents.append(
             types.Content(parts=[types.Part(text=system_message)], role="user")
         )
     elif status == "disapproved":
-        system_message = f"SYSTEM: The user has DISAPPROVED the report. You MUST revise the report based on their feedback: '{comment}'. Use the `research_assistant_tool` to find new information and then write a new version of the report."
+        system_message = f"SYSTEM: The user has DISAPPROVED the report. You MUST revise the report based on their feedback: '{comment}'. Use the `{research_tool_name()}` tool to find new information and then write a new version of the report."
         llm_request.contents.append(
             types.Content(parts=[types.Part(text=system_message)], role="user")
         )
     return None
 
 
+@traced()
 def save_review_id(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Dict
 ) -> Optional[LlmResponse]:
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import settings
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Light suffix stripping, checked in order; the first suffix that leaves a
+# stem of at least three characters wins. Good enough to fold plurals and
+# common derivations ("wars", "political", "financial") onto one key.
+_SUFFIXES = (
+    ("ational", "ate"),
+    ("ies", "y"),
+    ("ied", "y"),
+    ("ing", ""),
+    ("ial", ""),
+    ("ous", ""),
+    ("al", ""),
+    ("ed", ""),
+    ("es", ""),
+    ("s", ""),
+    ("e", ""),
+)
+
+
+def stem(token: str) -> str:
+    for suffix, replacement in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)] + replacement
+    return token
+
+
+def normalize(text: str) -> Tuple[str, ...]:
+    """Lower-cases, tokenizes and stems text into a tuple of stems."""
+    return tuple(stem(token) for token in _TOKEN_PATTERN.findall(text.lower()))
+
+
+class PhraseIndex:
+    """
+    Sensitive phrases indexed by their first stem.
+
+    A lookup walks the topic's stems once and only compares phrases that
+    start with the current stem, so cost depends on topic length rather
+    than on the number of loaded terms.
+    """
+
+    def __init__(self, terms_by_locale: Dict[str, Iterable[str]]):
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], str, str]]] = {}
+        self.size = 0
+        for locale, terms in terms_by_locale.items():
+            for term in terms:
+                stems = normalize(term)
+                if stems:
+                    self._phrases.setdefault(stems[0], []).append(
+                        (stems, term, locale)
+                    )
+                    self.size += 1
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+
+    def find(self, stems: Tuple[str, ...]) -> Optional[Tuple[str, str]]:
+        """Returns the first (term, locale) whose phrase occurs in `stems`."""
+        for position, token in enumerate(stems):
+            for phrase, term, locale in self._phrases.get(token, ()):
+                if stems[position : position + len(phrase)] == phrase:
+                    return term, locale
+        return None
+
+
+def load_sensitive_terms(terms_file: Optional[str]) -> Dict[str, List[str]]:
+    """
+    Returns sensitive terms keyed by locale.
+
+    `terms_file` is JSON mapping a locale to a list of words or phrases, e.g.
+    `{"default": ["war"], "de": ["krieg"]}`. Without a file the built-in
+    `SENSITIVE_TERMS` are used.
+    """
+    terms_by_locale = {"default": list(settings.SENSITIVE_TERMS)}
+    if terms_file:
+        with open(terms_file, encoding="utf-8") as f:
+            terms_by_locale.update(json.load(f))
+    return terms_by_locale
+
+
+class TopicClassifier:
+    """
+    Classifies topics against a hot-reloadable phrase index.
+
+    The terms file is re-checked at most every `reload_interval` seconds and
+    the index is rebuilt when its modification time changes. Results are
+    memoized per normalized topic and dropped on reload.
+    """
+
+    def __init__(
+        self,
+        terms_file: Optional[str] = None,
+        reload_interval: float = 5.0,
+        cache_size: int = 1024,
+    ):
+        self._terms_file = terms_file
+        self._reload_interval = reload_interval
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, ...], Optional[Tuple[str, str]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self._index = self._load()
+
+    def _file_mtime(self) -> Optional[int]:
+        if not self._terms_file:
+            return None
+        return os.stat(self._terms_file).st_mtime_ns
+
+    def _load(self) -> PhraseIndex:
+        self._mtime = self._file_mtime()
+        return PhraseIndex(load_sensitive_terms(self._terms_file))
+
+    def _maybe_reload(self) -> None:
+        if not self._terms_file:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self._reload_interval
+            try:
+                if self._file_mtime() == self._mtime:
+                    return
+                index = self._load()
+            except (OSError, ValueError) as e:
+                # Keep serving the previous index if the new file is unreadable.
+                print(f"⚠️ Could not reload sensitive terms: {e}")
+                return
+            self._index = index
+            self._cache.clear()
+
+    def reload(self) -> None:
+        """Forces the index to be rebuilt from the terms file."""
+        with self._lock:
+            self._index = self._load()
+            self._cache.clear()
+
+    def match(self, topic: str) -> Optional[Tuple[str, str]]:
+        """Returns the matching (term, locale) for a sensitive topic, else None."""
+        self._maybe_reload()
+        stems = normalize(topic)
+        if self._cache_size <= 0:
+            return self._index.find(stems)
+        with self._lock:
+            if stems in self._cache:
+                self._cache.move_to_end(stems)
+                return self._cache[stems]
+        result = self._index.find(stems)
+        with self._lock:
+            self._cache[stems] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+
+_classifier: Optional[TopicClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_topic_classifier() -> TopicClassifier:
+    """Returns the process-wide classifier, creating it on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = TopicClassifier(
+                    terms_file=settings.SENSITIVE_TERMS_FILE,
+                    reload_interval=settings.SENSITIVE_TERMS_RELOAD_SECONDS,
+                    cache_size=settings.CLASSIFIER_CACHE_SIZE,
+                )
+    return _classifier
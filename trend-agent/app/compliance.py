@@ -0,0 +1,152 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .config import settings
+
+
+class CompetitorMatch(NamedTuple):
+    competitor: str  # Canonical competitor name
+    term: str  # The name or alias that matched
+    start: int  # Offsets into the scanned text, end exclusive
+    end: int
+
+
+def _fold(text: str) -> str:
+    """Lower-cases one character at a time so offsets stay aligned with the input."""
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class CompetitorMatcher:
+    """
+    Aho-Corasick automaton over competitor names and aliases.
+
+    Scanning is a single pass over the text regardless of how many terms are
+    loaded. Matches are case-insensitive and only count when they are not part
+    of a longer word ("comp1" does not match inside "comp10").
+    """
+
+    def __init__(self, terms: Dict[str, str]):
+        """`terms` maps each name or alias to its canonical competitor name."""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+        self._terms: List[Tuple[str, str]] = []
+        for term, competitor in terms.items():
+            if term.strip():
+                self._add(term.strip(), competitor)
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _add(self, term: str, competitor: str) -> None:
+        state = 0
+        for c in _fold(term):
+            next_state = self._goto[state].get(c)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][c] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(len(self._terms))
+        self._terms.append((term, competitor))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and c not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(c, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state].extend(self._outputs[self._fail[next_state]])
+
+    def scan(self, text: str) -> List[CompetitorMatch]:
+        """Returns every whole-word match in `text`, ordered by position."""
+        goto, fail, outputs, terms = self._goto, self._fail, self._outputs, self._terms
+        matches = []
+        state = 0
+        for index, c in enumerate(_fold(text)):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for term_id in outputs[state]:
+                term, competitor = terms[term_id]
+                end = index + 1
+                start = end - len(term)
+                if self._on_word_boundary(text, term, start, end):
+                    matches.append(CompetitorMatch(competitor, term, start, end))
+        matches.sort(key=lambda match: (match.start, -match.end))
+        return matches
+
+    @staticmethod
+    def _on_word_boundary(text: str, term: str, start: int, end: int) -> bool:
+        if _is_word_char(term[0]) and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if _is_word_char(term[-1]) and end < len(text) and _is_word_char(text[end]):
+            return False
+        return True
+
+
+def load_competitor_terms(
+    competitors: Iterable[str], competitors_file: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    Collects competitor names and aliases from settings and an optional file.
+
+    Each entry (a settings item or a file line) is `Canonical|alias|alias`.
+    Blank lines and lines starting with `#` are ignored.
+    """
+    entries = list(competitors)
+    if competitors_file:
+        with open(competitors_file, encoding="utf-8") as f:
+            entries.extend(
+                line for line in f if line.strip() and not line.startswith("#")
+            )
+    terms: Dict[str, str] = {}
+    for entry in entries:
+        names = [name.strip() for name in entry.split("|") if name.strip()]
+        if names:
+            for name in names:
+                terms.setdefault(name, names[0])
+    return terms
+
+
+_matcher_lock = threading.Lock()
+_matcher: Optional[CompetitorMatcher] = None
+_matcher_version: Optional[Tuple] = None
+
+
+def _config_version() -> Tuple:
+    competitors_file = settings.COMPETITORS_FILE
+    mtime = os.stat(competitors_file).st_mtime_ns if competitors_file else None
+    return tuple(settings.COMPETITORS), competitors_file, mtime
+
+
+def get_competitor_matcher() -> CompetitorMatcher:
+    """
+    Returns the matcher for the current competitor configuration, rebuilding
+    it only when the configured list or the competitors file changes.
+    """
+    global _matcher, _matcher_version
+    version = _config_version()
+    if _matcher is None or version != _matcher_version:
+        with _matcher_lock:
+            if _matcher is None or version != _matcher_version:
+                terms = load_competitor_terms(
+                    settings.COMPETITORS, settings.COMPETITORS_FILE
+                )
+                _matcher = CompetitorMatcher(terms)
+                _matcher_version = version
+    return _matcher
@@ -1,6 +1,15 @@
 import os
+import tempfile
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Optional
+
+# Per-user directory (created 0700) for local state that holds OAuth tokens or
+# user data, instead of the shared temp directory.
+PRIVATE_DATA_DIR = os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"),
+    "trend-agent",
+)
 
 
 class Settings(BaseSettings):
@@ -22,9 +31,82 @@ class Settings(BaseSettings):
         "https://www.googleapis.com/auth/drive.file",
     ]
     REPORT_CHAR_LIMIT_FOR_REVIEW: int = 500
+    # Entries are "Canonical|alias|alias"; COMPETITORS_FILE adds one entry per line
     COMPETITORS: List[str] = ["comp1", "comp2"]
+    COMPETITORS_FILE: Optional[str] = None
+    # Built-in sensitive topics; SENSITIVE_TERMS_FILE (JSON, locale -> terms) adds more
+    SENSITIVE_TERMS: List[str] = [
+        "politics",
+        "conflict",
+        "finance",
+        "medical",
+        "danger",
+        "war",
+        "religion",
+    ]
+    SENSITIVE_TERMS_FILE: Optional[str] = None
+    SENSITIVE_TERMS_RELOAD_SECONDS: float = 5.0
+    CLASSIFIER_CACHE_SIZE: int = 1024  # 0 disables the topic result cache
     REPORT_REVIEW_ID_KEY: str = "report_review_id"
+    # Last disapproved review and its text; the next draft is sent as a diff
+    REPORT_PARENT_REVIEW_KEY: str = "report_parent_review"
+    # "reference": on approval the model passes only the review ID to
+    # save_report_formats, which reads the text itself; "inline" pastes it in;
+    # "stream": no model call, the report is shown at once and each file link
+    # as its upload finishes (see delivery.ReportDeliveryAgent)
+    APPROVED_REPORT_DELIVERY: str = "reference"
+    APPROVED_REPORT_KEY: str = "approved_report"
+    REPORT_DELIVERY_KEY: str = "report_delivery"
     VERIFICATION_REASONS_KEY: str = "verification_reasons"
+    # Seconds the review app may hold a status request open waiting for a decision
+    REVIEW_WAIT_TIMEOUT_SECONDS: float = 10.0
+    # Review service HTTP client
+    REVIEW_SERVICE_CONNECT_TIMEOUT: float = 3.05
+    REVIEW_SERVICE_READ_TIMEOUT: float = 15.0
+    REVIEW_SERVICE_MAX_RETRIES: int = 2
+    REVIEW_SERVICE_BACKOFF_SECONDS: float = 0.25
+    REVIEW_SERVICE_POOL_SIZE: int = 10
+    # Tenant sent with each review; the review app routes it to that tenant's
+    # reviewer pool. Defaults to AGENT_NAME
+    REVIEW_TENANT: Optional[str] = None
+    # Max concurrent GCS/Drive uploads when saving report formats
+    REPORT_UPLOAD_CONCURRENCY: int = 6
+    # Rendered reports larger than this are spilled to a temp file instead of memory
+    REPORT_SPILL_THRESHOLD_BYTES: int = 32 * 1024 * 1024
+    # Links to already-uploaded report artifacts remembered in process
+    ARTIFACT_INDEX_SIZE: int = 256
+    # Max cached Google API clients/transports (keyed by access token)
+    GOOGLE_CLIENT_CACHE_SIZE: int = 64
+    # Refresh cached OAuth credentials in the background this long before expiry
+    CREDENTIAL_REFRESH_MARGIN_SECONDS: float = 300.0
+    CREDENTIAL_CACHE_SIZE: int = 256  # Max sessions with cached credentials
+    # Reviewer emails are queued in this SQLite outbox and sent in the background.
+    # Queued rows hold the sender's OAuth credentials, so the file is private.
+    NOTIFICATION_OUTBOX_PATH: str = os.path.join(PRIVATE_DATA_DIR, "outbox.sqlite3")
+    NOTIFICATION_BATCH_SIZE: int = 50  # Emails per Gmail batch request
+    NOTIFICATION_BATCH_WINDOW_SECONDS: float = 1.0
+    # When > 0, hold reviewer emails this long and send one digest per reviewer
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: float = 0.0
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BACKOFF_SECONDS: float = 2.0
+    # "fanout": the root agent passes several sub-queries to research_topic,
+    # which runs them concurrently and merges the findings; "single": one query
+    # to the research_agent tool
+    RESEARCH_MODE: str = "fanout"
+    RESEARCH_CONCURRENCY: int = 4  # Max research sub-queries in flight
+    RESEARCH_MAX_QUERIES: int = 6
+    # Research findings cached by normalized query: "memory", "sqlite" (shared
+    # by agent processes on one host, at RESEARCH_CACHE_PATH) or "off"
+    RESEARCH_CACHE_BACKEND: str = "memory"
+    RESEARCH_CACHE_PATH: str = os.path.join(PRIVATE_DATA_DIR, "research.sqlite3")
+    RESEARCH_CACHE_TTL_SECONDS: float = 6 * 3600
+    RESEARCH_CACHE_SIZE: int = 512  # Max cached queries
+    # OpenTelemetry span export: "console", "file" (JSON lines) or unset (off,
+    # or whatever exporter the host installs)
+    TRACE_EXPORTER: Optional[str] = None
+    TRACE_FILE_PATH: str = os.path.join(
+        tempfile.gettempdir(), "trend-agent-traces.jsonl"
+    )
     MODEL_NAME: str = "gemini-2.5-flash"  # Default model name for the agent
 
     # Pydantic V2 configuration
@@ -33,9 +115,34 @@ class Settings(BaseSettings):
     )
 
 
+@lru_cache(maxsize=None)
 def get_settings() -> Settings:
+    # Export .env into the process environment as well, for the SDKs
+    # (google-genai, vertexai) that read their configuration from os.environ.
+    from dotenv import load_dotenv
+
+    load_dotenv()
     return Settings()
 
 
-# Instantiate settings for easy import
-settings = get_settings()
+class _LazySettings:
+    """Resolves attributes against `get_settings()` on first access."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+# Importable everywhere; the environment is only read when a setting is used
+settings: Settings = _LazySettings()  # type: ignore[assignment]
+
+
+@lru_cache(maxsize=None)
+def init_vertexai() -> None:
+    """Initializes the Vertex AI SDK once; only needed for Agent Engine deployment."""
+    import vertexai
+
+    vertexai.init(
+        project=settings.GOOGLE_CLOUD_PROJECT,
+        location=settings.GOOGLE_CLOUD_LOCATION,
+        staging_bucket=settings.STAGING_BUCKET,
+    )
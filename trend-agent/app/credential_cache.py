@@ -0,0 +1,167 @@
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from .config import settings
+from .review_client import LatencyRecorder
+from .tracing import submit, tracer
+
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="credential-refresh"
+)
+
+
+class _Entry:
+    def __init__(self, fingerprint: Hashable, creds: Credentials):
+        self.fingerprint = fingerprint
+        self.creds = creds
+        # Held for the duration of a refresh; makes refreshes single-flight.
+        self.refresh_lock = threading.Lock()
+
+
+def _seconds_until_expiry(creds: Credentials) -> Optional[float]:
+    if creds.expiry is None:
+        return None
+    # google-auth stores expiry as a naive UTC datetime.
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return (creds.expiry - now).total_seconds()
+
+
+class CredentialCache:
+    """
+    Per-session cache of `Credentials` objects.
+
+    Entries are keyed by session and tagged with a fingerprint of the state
+    they were built from (an access token, or a refresh token for local
+    logins); a different fingerprint rebuilds the entry. Refreshable
+    credentials within `refresh_margin` seconds of expiry are refreshed on a
+    background thread while the current token is still served; expired ones
+    are refreshed inline. Either way at most one refresh per session runs at
+    a time and concurrent callers share its result.
+    """
+
+    def __init__(self, refresh_margin: float = 300.0, max_sessions: int = 256):
+        self._refresh_margin = refresh_margin
+        self._max_sessions = max_sessions
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+        }
+        self.refresh_latency = LatencyRecorder()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(
+        self,
+        session_key: Hashable,
+        fingerprint: Hashable,
+        factory: Callable[[], Credentials],
+    ) -> Credentials:
+        """
+        Returns usable credentials for the session, building them with
+        `factory` on a miss. Raises if an inline refresh fails.
+        """
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(session_key)
+                self._counters["hits"] += 1
+            else:
+                entry = None
+                self._counters["misses"] += 1
+        if entry is None:
+            entry = _Entry(fingerprint, factory())
+            with self._lock:
+                self._entries[session_key] = entry
+                self._entries.move_to_end(session_key)
+                while len(self._entries) > self._max_sessions:
+                    self._entries.popitem(last=False)
+
+        creds = entry.creds
+        if not creds.refresh_token:
+            return creds
+        remaining = _seconds_until_expiry(creds)
+        if not creds.valid or (remaining is not None and remaining <= 0):
+            return self._refresh_inline(entry)
+        if remaining is not None and remaining < self._refresh_margin:
+            if entry.refresh_lock.acquire(blocking=False):
+                submit(_refresh_executor, self._refresh_in_background, entry)
+        return creds
+
+    def invalidate(self, session_key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(session_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/refresh counters and refresh latency percentiles."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["sessions"] = len(self._entries)
+        stats["refresh_latency"] = self.refresh_latency.summary().get("refresh", {})
+        return stats
+
+    def _refresh_inline(self, entry: _Entry) -> Credentials:
+        stale = entry.creds
+        with entry.refresh_lock:
+            # Another caller may have refreshed while we waited for the lock.
+            if entry.creds is not stale and entry.creds.valid:
+                return entry.creds
+            self._refresh(entry)
+        return entry.creds
+
+    def _refresh_in_background(self, entry: _Entry) -> None:
+        try:
+            self._refresh(entry)
+        except Exception as e:
+            # The current token is still valid; the next call retries inline.
+            print(f"⚠️ Background credential refresh failed: {e}")
+        finally:
+            entry.refresh_lock.release()
+
+    def _refresh(self, entry: _Entry) -> None:
+        # Refresh a copy so callers holding the current object never see a
+        # half-updated token.
+        creds = Credentials.from_authorized_user_info(
+            json.loads(entry.creds.to_json()), entry.creds.scopes
+        )
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span("oauth.refresh"):
+                creds.refresh(Request())
+        except Exception:
+            self._count("refresh_failures")
+            self.refresh_latency.record("refresh", time.perf_counter() - start, None)
+            raise
+        self.refresh_latency.record("refresh", time.perf_counter() - start, 200)
+        self._count("refreshes")
+        entry.creds = creds
+
+
+_cache: Optional[CredentialCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_credential_cache() -> CredentialCache:
+    """Returns the process-wide credential cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CredentialCache(
+                    refresh_margin=settings.CREDENTIAL_REFRESH_MARGIN_SECONDS,
+                    max_sessions=settings.CREDENTIAL_CACHE_SIZE,
+                )
+    return _cache
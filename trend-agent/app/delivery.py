@@ -0,0 +1,131 @@
+import asyncio
+import re
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from .auth_tool import get_authenticated_credentials
+from .config import settings
+from .tools import title_slug
+from .tracing import tracer
+
+FORMAT_LABELS = {".md": "Markdown", ".pdf": "PDF", ".docx": "Word"}
+TARGET_LABELS = {"gcs": "Cloud Storage", "drive": "Google Drive"}
+DEFAULT_REPORT_TITLE = "Market Report"
+DELIVERED_MESSAGE = "All report files are saved."
+
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+def report_title(report_text: str) -> str:
+    """The report's first Markdown heading, used as its file title."""
+    match = _HEADING.search(report_text)
+    return match.group(1).strip() if match else DEFAULT_REPORT_TITLE
+
+
+class ReportDeliveryAgent(BaseAgent):
+    """
+    Root agent for `APPROVED_REPORT_DELIVERY=stream`. Runs the analyst agent
+    (its only sub-agent) and, when the analyst's turn ends on an approved
+    report, delivers it without another model call: the report text is sent
+    at once, then each GCS and Drive link as its upload finishes, then a
+    summary of anything that failed.
+    """
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        async for event in self.sub_agents[0].run_async(ctx):
+            yield event
+        delivery = ctx.session.state.get(settings.REPORT_DELIVERY_KEY)
+        if delivery:
+            async for event in self._deliver(ctx, delivery):
+                yield event
+
+    def _event(
+        self,
+        ctx: InvocationContext,
+        text: str,
+        actions: Optional[EventActions] = None,
+    ) -> Event:
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            actions=actions or EventActions(),
+        )
+
+    async def _deliver(
+        self, ctx: InvocationContext, delivery: Dict[str, Any]
+    ) -> AsyncGenerator[Event, None]:
+        report_text = delivery["outline"]
+        title = report_title(report_text)
+        # Clearing the key in the first event means a failed delivery is not
+        # repeated on the next turn; the user can still ask for the files.
+        actions = EventActions(state_delta={settings.REPORT_DELIVERY_KEY: None})
+        creds = get_authenticated_credentials(
+            ToolContext(ctx, event_actions=actions), initiate_auth_flow=False
+        )
+        yield self._event(
+            ctx,
+            f"{report_text}\n\nSaving it as Markdown, PDF and Word; the links "
+            "follow as each upload finishes.",
+            actions,
+        )
+        if not creds:
+            yield self._event(
+                ctx,
+                "I couldn't save the report files because Google authentication "
+                "is missing. Ask me to save the report after signing in again.",
+            )
+            return
+
+        # Deferred: fpdf, python-docx and the storage/Drive clients load on
+        # first save.
+        from .reports import save_reports
+
+        loop = asyncio.get_running_loop()
+        links: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+        def on_link(target: str, suffix: str, link: str) -> None:
+            label = f"{FORMAT_LABELS.get(suffix, suffix)} ({TARGET_LABELS[target]})"
+            loop.call_soon_threadsafe(links.put_nowait, f"{label}: {link}")
+
+        def save():
+            try:
+                with tracer.start_as_current_span("delivery.save_reports"):
+                    return save_reports(
+                        report_text,
+                        title,
+                        title_slug(title),
+                        creds,
+                        owner=ctx.session.user_id,
+                        on_link=on_link,
+                    )
+            finally:
+                loop.call_soon_threadsafe(links.put_nowait, None)
+
+        # to_thread carries the trace context, so the save span and the render
+        # and upload spans under it stay in this invocation's trace.
+        saving = asyncio.create_task(asyncio.to_thread(save))
+        while (line := await links.get()) is not None:
+            yield self._event(ctx, line)
+        try:
+            _, _, errors = await saving
+        except Exception as e:
+            yield self._event(ctx, f"Saving the report files failed: {e}")
+            return
+        if errors:
+            failed = ", ".join(
+                f"{FORMAT_LABELS.get(suffix, suffix)} ({TARGET_LABELS[target]})"
+                for target, by_suffix in errors.items()
+                for suffix in by_suffix
+            )
+            yield self._event(ctx, f"These uploads failed: {failed}.")
+        else:
+            yield self._event(ctx, DELIVERED_MESSAGE)
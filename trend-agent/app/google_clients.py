@@ -0,0 +1,114 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import google_auth_httplib2
+import httplib2
+from google.cloud import storage
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import Resource, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from .config import settings
+
+# APIs the tools talk to; their discovery documents are loaded by `prewarm`.
+PREWARM_APIS = (("gmail", "v1"), ("drive", "v3"))
+
+
+class _LRUCache:
+    """A small thread-safe LRU mapping used for per-credential client objects."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        # Build outside the lock so a slow constructor doesn't serialize callers.
+        value = factory()
+        with self._lock:
+            value = self._items.setdefault(key, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+        return value
+
+
+_discovery_docs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_discovery_lock = threading.Lock()
+_services = _LRUCache(settings.GOOGLE_CLIENT_CACHE_SIZE)
+_storage_clients = _LRUCache(settings.GOOGLE_CLIENT_CACHE_SIZE)
+_thread_local = threading.local()
+
+
+def _credential_key(creds: Credentials) -> Hashable:
+    return creds.token or id(creds)
+
+
+def _discovery_doc(api: str, version: str) -> Dict[str, Any]:
+    """Loads and parses the bundled (static) discovery document once per process."""
+    key = (api, version)
+    doc = _discovery_docs.get(key)
+    if doc is None:
+        with _discovery_lock:
+            doc = _discovery_docs.get(key)
+            if doc is None:
+                content = get_static_doc(api, version)
+                if content is None:
+                    raise ValueError(
+                        f"No static discovery document for {api} {version}."
+                    )
+                doc = _discovery_docs[key] = json.loads(content)
+    return doc
+
+
+def get_service(api: str, version: str, creds: Credentials) -> Resource:
+    """
+    Returns a cached discovery-based client for the given credentials.
+
+    Resource objects share an httplib2 transport that is not thread-safe, so
+    execute requests with `http=authorized_http(creds)`.
+    """
+    return _services.get_or_create(
+        (api, version, _credential_key(creds)),
+        lambda: build_from_document(
+            _discovery_doc(api, version), credentials=creds
+        ),
+    )
+
+
+def get_storage_client(creds: Credentials) -> storage.Client:
+    """Returns a cached Cloud Storage client for the given credentials."""
+    return _storage_clients.get_or_create(
+        _credential_key(creds),
+        lambda: storage.Client(
+            project=settings.GOOGLE_CLOUD_PROJECT, credentials=creds
+        ),
+    )
+
+
+def authorized_http(creds: Credentials) -> google_auth_httplib2.AuthorizedHttp:
+    """
+    Returns a keep-alive httplib2 transport for the credentials, private to
+    the calling thread.
+    """
+    transports = getattr(_thread_local, "transports", None)
+    if transports is None:
+        transports = _thread_local.transports = _LRUCache(
+            settings.GOOGLE_CLIENT_CACHE_SIZE
+        )
+    return transports.get_or_create(
+        _credential_key(creds),
+        lambda: google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http()),
+    )
+
+
+def prewarm() -> None:
+    """Parses the discovery documents up front so the first tool call doesn't."""
+    for api, version in PREWARM_APIS:
+        _discovery_doc(api, version)
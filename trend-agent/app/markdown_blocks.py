@@ -0,0 +1,198 @@
+import re
+from typing import List, NamedTuple, Tuple, Union
+
+
+class Span(NamedTuple):
+    text: str
+    bold: bool = False
+    italic: bool = False
+    code: bool = False
+
+
+class Heading(NamedTuple):
+    level: int  # 1-6
+    spans: List[Span]
+
+
+class Paragraph(NamedTuple):
+    spans: List[Span]
+
+
+class ListBlock(NamedTuple):
+    ordered: bool
+    items: List[Tuple[int, List[Span]]]  # (nesting depth, item text)
+
+
+class Table(NamedTuple):
+    header: List[List[Span]]
+    rows: List[List[List[Span]]]
+
+
+class CodeBlock(NamedTuple):
+    text: str
+
+
+class Quote(NamedTuple):
+    spans: List[Span]
+
+
+class Rule(NamedTuple):
+    pass
+
+
+Block = Union[Heading, Paragraph, ListBlock, Table, CodeBlock, Quote, Rule]
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_RULE = re.compile(r"^(\*\s*){3,}$|^(-\s*){3,}$|^(_\s*){3,}$")
+_LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+_INLINE = re.compile(
+    r"\*\*(?P<b1>.+?)\*\*|__(?P<b2>.+?)__"
+    r"|(?<![\w*])\*(?P<i1>[^*\s][^*]*?)\*|(?<![\w_])_(?P<i2>[^_\s][^_]*?)_"
+    r"|`(?P<code>[^`]+)`"
+    r"|\[(?P<label>[^\]]+)\]\((?P<url>[^)\s]+)\)"
+)
+
+
+def parse_inline(text: str) -> List[Span]:
+    """Splits text into spans for **bold**, *italic*, `code` and [links](url)."""
+    spans: List[Span] = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            spans.append(Span(text[position : match.start()]))
+        groups = match.groupdict()
+        if groups["b1"] or groups["b2"]:
+            spans.append(Span(groups["b1"] or groups["b2"], bold=True))
+        elif groups["i1"] or groups["i2"]:
+            spans.append(Span(groups["i1"] or groups["i2"], italic=True))
+        elif groups["code"]:
+            spans.append(Span(groups["code"], code=True))
+        else:
+            spans.append(Span(f"{groups['label']} ({groups['url']})"))
+        position = match.end()
+    if position < len(text):
+        spans.append(Span(text[position:]))
+    return spans
+
+
+def _table_cells(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+
+def _starts_block(lines: List[str], index: int) -> bool:
+    stripped = lines[index].strip()
+    return bool(
+        not stripped
+        or stripped.startswith(("```", ">", "|"))
+        or _HEADING.match(stripped)
+        or _RULE.match(stripped)
+        or _LIST_ITEM.match(lines[index])
+    )
+
+
+def parse_markdown(text: str) -> List[Block]:
+    """
+    Parses the subset of markdown the agent writes into a flat list of
+    blocks: ATX headings, paragraphs, (nested) bullet and numbered lists,
+    pipe tables, fenced code, quotes and horizontal rules.
+    """
+    lines = text.expandtabs(4).splitlines()
+    blocks: List[Block] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped:
+            i += 1
+            continue
+
+        if stripped.startswith("```"):
+            code_lines = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code_lines.append(lines[i])
+                i += 1
+            blocks.append(CodeBlock("\n".join(code_lines)))
+            i += 1  # closing fence
+            continue
+
+        heading = _HEADING.match(stripped)
+        if heading:
+            level, title = len(heading.group(1)), heading.group(2)
+            blocks.append(Heading(level, parse_inline(title)))
+            i += 1
+            continue
+
+        if _RULE.match(stripped):
+            blocks.append(Rule())
+            i += 1
+            continue
+
+        if (
+            stripped.startswith("|")
+            and i + 1 < len(lines)
+            and _TABLE_SEPARATOR.match(lines[i + 1].strip())
+        ):
+            header = [parse_inline(cell) for cell in _table_cells(stripped)]
+            rows = []
+            i += 2
+            while i < len(lines) and lines[i].strip().startswith("|"):
+                cells = [parse_inline(cell) for cell in _table_cells(lines[i])]
+                # Pad or trim so every row has one cell per header column.
+                cells = (cells + [[] for _ in header])[: len(header)]
+                rows.append(cells)
+                i += 1
+            blocks.append(Table(header, rows))
+            continue
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            ordered = item.group(2)[0].isdigit()
+            items: List[Tuple[int, str]] = []
+            indents: List[int] = []  # indentation of each open nesting level
+            while i < len(lines):
+                item = _LIST_ITEM.match(lines[i])
+                if item:
+                    indent = len(item.group(1))
+                    while indents and indent < indents[-1]:
+                        indents.pop()
+                    if not indents or indent > indents[-1]:
+                        indents.append(indent)
+                    depth = len(indents) - 1
+                    # A top-level item of the other kind starts a new list.
+                    if depth == 0 and item.group(2)[0].isdigit() != ordered:
+                        break
+                    items.append((depth, item.group(3)))
+                elif lines[i].strip() and lines[i].startswith(" ") and items:
+                    # Indented continuation of the previous item.
+                    depth, item_text = items[-1]
+                    items[-1] = (depth, f"{item_text} {lines[i].strip()}")
+                else:
+                    break
+                i += 1
+            blocks.append(
+                ListBlock(ordered, [(depth, parse_inline(t)) for depth, t in items])
+            )
+            continue
+
+        if stripped.startswith(">"):
+            quote_lines = []
+            while i < len(lines) and lines[i].strip().startswith(">"):
+                quote_lines.append(lines[i].strip()[1:].strip())
+                i += 1
+            blocks.append(Quote(parse_inline(" ".join(quote_lines))))
+            continue
+
+        paragraph_lines = [stripped]
+        i += 1
+        while i < len(lines) and not _starts_block(lines, i):
+            paragraph_lines.append(lines[i].strip())
+            i += 1
+        blocks.append(Paragraph(parse_inline(" ".join(paragraph_lines))))
+    return blocks
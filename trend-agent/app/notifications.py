@@ -0,0 +1,447 @@
+import base64
+import json
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.oauth2.credentials import Credentials
+
+from .config import settings
+from .private_files import connect_private_sqlite
+from .tracing import tracer
+
+# Sent rows are kept this long so a resubmitted review is not emailed twice.
+SENT_RETENTION_SECONDS = 7 * 24 * 3600
+# A claimed row is retried by another dispatcher if not settled within this.
+CLAIM_LEASE_SECONDS = 120.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    review_id TEXT PRIMARY KEY,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    credentials TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    review_url TEXT,
+    claimed_until REAL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+# Columns added after the first release of the outbox, for existing files.
+_ADDED_COLUMNS = {"review_url": "TEXT", "claimed_until": "REAL", "owner": "TEXT"}
+# Rows a dispatcher may send: pending, not leased by a live dispatcher.
+_UNCLAIMED = (
+    "status = 'pending' AND (claimed_until IS NULL OR claimed_until < :now)"
+)
+
+
+def _credentials_from_json(info: Dict[str, Any]) -> Credentials:
+    if info.get("refresh_token"):
+        return Credentials.from_authorized_user_info(info, settings.SCOPES)
+    return Credentials(token=info["token"], scopes=settings.SCOPES)
+
+
+def _raw_message(recipient: str, subject: str, body: str) -> str:
+    message = EmailMessage()
+    message.set_content(body)
+    message["To"] = recipient
+    message["Subject"] = subject
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+
+def _digest(rows: List[sqlite3.Row]) -> Tuple[str, str]:
+    """Subject and body of one email covering several reviews."""
+    # Deferred so the outbox can be used without the HTTP client stack.
+    from .review_client import get_review_client
+
+    links = "\n".join(
+        f"- {row['review_id']}: {row['review_url'] or '(link unavailable)'}"
+        for row in rows
+    )
+    subject = f"{len(rows)} Market Reports Need Verification"
+    body = (
+        f"{len(rows)} market analysis reports require your verification:\n\n"
+        f"{links}\n\n"
+        f"All pending reviews: {get_review_client().dashboard_url()}"
+    )
+    return subject, body
+
+
+class NotificationOutbox:
+    """
+    Durable SQLite outbox of reviewer emails, one row per review.
+
+    Rows survive process restarts. Because review_id is the primary key,
+    queueing the same review twice sends one email.
+    """
+
+    def __init__(self, path: str):
+        # Queued rows hold OAuth tokens; they are cleared once a row is settled.
+        self._conn = connect_private_sqlite(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {
+            row["name"]: row
+            for row in self._conn.execute("PRAGMA table_info(outbox)")
+        }
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(
+                    f"ALTER TABLE outbox ADD COLUMN {column} {column_type}"
+                )
+        if columns["credentials"]["notnull"]:
+            self._allow_null_credentials()
+        self._lock = threading.Lock()
+
+    def _allow_null_credentials(self) -> None:
+        """Rebuilds an outbox from before settled rows dropped their credentials."""
+        names = ", ".join(
+            row["name"] for row in self._conn.execute("PRAGMA table_info(outbox)")
+        )
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("ALTER TABLE outbox RENAME TO outbox_old")
+            self._conn.execute("DROP INDEX outbox_due")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    self._conn.execute(statement)
+            self._conn.execute(
+                f"INSERT INTO outbox ({names}) SELECT {names} FROM outbox_old"
+            )
+            self._conn.execute("DROP TABLE outbox_old")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def add(
+        self,
+        review_id: str,
+        recipient: str,
+        subject: str,
+        body: str,
+        creds: Credentials,
+        review_url: Optional[str] = None,
+        delay: float = 0.0,
+        owner: Optional[str] = None,
+    ) -> bool:
+        """
+        Queues an email, due after `delay` seconds; returns False if this
+        review was already queued. `owner` is the user whose credentials send
+        it; digests only combine rows of the same owner.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (review_id, recipient, subject, body,"
+                " credentials, review_url, next_attempt_at, created_at, updated_at,"
+                " owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    review_id,
+                    recipient,
+                    subject,
+                    body,
+                    creds.to_json(),
+                    review_url,
+                    now + delay,
+                    now,
+                    now,
+                    owner,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def claim_due(self, limit: int, sweep: bool = False) -> List[sqlite3.Row]:
+        """
+        Leases up to `limit` due rows so no other dispatcher sends them. With
+        `sweep`, rows not yet due that go to the same recipients as the due
+        ones are claimed too, so a digest covers everything waiting.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT * FROM outbox WHERE {_UNCLAIMED}"
+                    " AND next_attempt_at <= :now ORDER BY next_attempt_at"
+                    " LIMIT :limit",
+                    {"now": now, "limit": limit},
+                ).fetchall()
+                if sweep and rows and len(rows) < limit:
+                    params = {"now": now, "limit": limit - len(rows)}
+                    for i, recipient in enumerate({row["recipient"] for row in rows}):
+                        params[f"r{i}"] = recipient
+                    recipients = ", ".join(f":{key}" for key in params if key[0] == "r")
+                    rows += self._conn.execute(
+                        f"SELECT * FROM outbox WHERE {_UNCLAIMED}"
+                        " AND next_attempt_at > :now AND attempts = 0"
+                        f" AND recipient IN ({recipients})"
+                        " ORDER BY next_attempt_at LIMIT :limit",
+                        params,
+                    ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET claimed_until = ? WHERE review_id = ?",
+                    [(now + CLAIM_LEASE_SECONDS, row["review_id"]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def mark_sent(self, review_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1,"
+                " last_error = NULL, claimed_until = NULL, credentials = NULL,"
+                " updated_at = ?"
+                " WHERE review_id = ?",
+                (time.time(), review_id),
+            )
+
+    def mark_failed(self, review_id: str, error: str) -> None:
+        """Schedules a retry with exponential backoff, or gives up."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM outbox WHERE review_id = ?", (review_id,)
+            ).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            gave_up = attempts >= settings.NOTIFICATION_MAX_ATTEMPTS
+            status = "failed" if gave_up else "pending"
+            delay = settings.NOTIFICATION_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+            # A row that is given up on no longer needs the sender's tokens.
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ?,"
+                " next_attempt_at = ?, claimed_until = NULL, updated_at = ?,"
+                " credentials = CASE WHEN ? THEN NULL ELSE credentials END"
+                " WHERE review_id = ?",
+                (status, attempts, error, now + delay, now, gave_up, review_id),
+            )
+        if gave_up:
+            print(f"❌ Giving up on reviewer email for review {review_id}: {error}")
+
+    def status(self, review_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error FROM outbox WHERE review_id = ?",
+                (review_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next pending row is due, or None if there are none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(MAX(next_attempt_at, COALESCE(claimed_until, 0)))"
+                " AS due FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        if row["due"] is None:
+            return None
+        return max(0.0, row["due"] - time.time())
+
+    def prune(self) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status IN ('sent', 'failed')"
+                " AND updated_at < ?",
+                (time.time() - SENT_RETENTION_SECONDS,),
+            )
+
+
+class NotificationDispatcher:
+    """
+    Sends queued reviewer emails from a background thread.
+
+    After a wake-up the dispatcher waits `batch_window` seconds so that
+    emails queued close together go out as one Gmail batch request per
+    sender. With a `digest_window`, each email is held for that long and
+    everything waiting for the same reviewer is then sent as a single
+    digest listing all the review links. Failed sends are retried with
+    backoff, up to `NOTIFICATION_MAX_ATTEMPTS`. Rows left over from a
+    previous process are picked up once the dispatcher starts.
+    """
+
+    def __init__(
+        self,
+        outbox: NotificationOutbox,
+        batch_size: int,
+        batch_window: float,
+        digest_window: float = 0.0,
+    ):
+        self._outbox = outbox
+        self._batch_size = batch_size
+        self._batch_window = batch_window
+        self._digest_window = digest_window
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="notification-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def outbox(self) -> NotificationOutbox:
+        return self._outbox
+
+    def enqueue(
+        self,
+        review_id: str,
+        recipient: str,
+        subject: str,
+        body: str,
+        creds: Credentials,
+        review_url: Optional[str] = None,
+        owner: Optional[str] = None,
+    ) -> bool:
+        """Persists the email and returns without waiting for it to be sent."""
+        added = self._outbox.add(
+            review_id,
+            recipient,
+            subject,
+            body,
+            creds,
+            review_url=review_url,
+            delay=self._digest_window,
+            owner=owner,
+        )
+        self._wakeup.set()
+        return added
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._outbox.prune()
+                timeout = self._outbox.next_due_in()
+                if timeout is None or timeout > 0:
+                    self._wakeup.wait(timeout)
+                if self._wakeup.is_set():
+                    # Let closely spaced submissions accumulate into one batch.
+                    time.sleep(self._batch_window)
+                    self._wakeup.clear()
+                sweep = self._digest_window > 0
+                rows = self._outbox.claim_due(self._batch_size, sweep)
+                while rows:
+                    self._send(rows)
+                    rows = self._outbox.claim_due(self._batch_size, sweep)
+            except Exception as e:
+                print(f"⚠️ Notification dispatcher error: {e}")
+                time.sleep(settings.NOTIFICATION_RETRY_BACKOFF_SECONDS)
+
+    def _messages(
+        self, rows: List[sqlite3.Row]
+    ) -> List[Tuple[List[sqlite3.Row], str]]:
+        """
+        Returns (rows, raw message) pairs: one message per row, or with a
+        digest window one message per recipient and owner covering all their
+        rows. A digest never mixes users: it is sent from the owner's Gmail
+        and links to the reviews they queued. Rows without an owner (queued
+        by older versions) are sent on their own.
+        """
+        if self._digest_window <= 0:
+            groups = [[row] for row in rows]
+        else:
+            groups = [[row] for row in rows if row["owner"] is None]
+
+            def digest_key(row: sqlite3.Row) -> Tuple[str, str]:
+                return row["recipient"], row["owner"]
+
+            owned = sorted(
+                (row for row in rows if row["owner"] is not None), key=digest_key
+            )
+            groups += [list(group) for _, group in groupby(owned, key=digest_key)]
+        messages = []
+        for group in groups:
+            if len(group) == 1:
+                subject, body = group[0]["subject"], group[0]["body"]
+            else:
+                subject, body = _digest(group)
+            messages.append((group, _raw_message(group[0]["recipient"], subject, body)))
+        return messages
+
+    def _send(self, rows: List[sqlite3.Row]) -> None:
+        # Deferred like the other Google API users; see tools.py.
+        from .google_clients import authorized_http, get_service
+
+        # A digest is sent with the credentials of its newest row, all of which
+        # belong to one owner. Rows the owner queued from other sessions, or
+        # before a token refresh, still end up in the same digest.
+        messages_by_sender: Dict[str, List[Tuple[List[sqlite3.Row], str]]] = {}
+        for group, raw in self._messages(rows):
+            newest = max(group, key=lambda row: row["created_at"])
+            messages_by_sender.setdefault(newest["credentials"], []).append(
+                (group, raw)
+            )
+
+        # One batch per sender: the credentials decide whose Gmail sends it.
+        for credentials_json, messages in messages_by_sender.items():
+            group = [row for message_rows, _ in messages for row in message_rows]
+            try:
+                creds = _credentials_from_json(json.loads(credentials_json))
+                gmail_service = get_service("gmail", "v1", creds)
+            except Exception as e:
+                for row in group:
+                    self._outbox.mark_failed(row["review_id"], str(e))
+                continue
+
+            # Batch request ids must be unique; use the first review of each message.
+            review_ids_by_request: Dict[str, List[str]] = {}
+            settled = set()
+
+            def on_response(request_id: str, response: Any, exception: Exception):
+                for review_id in review_ids_by_request[request_id]:
+                    settled.add(review_id)
+                    if exception is None:
+                        self._outbox.mark_sent(review_id)
+                    else:
+                        self._outbox.mark_failed(review_id, str(exception))
+
+            batch = gmail_service.new_batch_http_request(callback=on_response)
+            for rows_for_message, raw in messages:
+                review_ids = [row["review_id"] for row in rows_for_message]
+                review_ids_by_request[review_ids[0]] = review_ids
+                request = gmail_service.users().messages().send(
+                    userId="me", body={"raw": raw}
+                )
+                batch.add(request, request_id=review_ids[0])
+            try:
+                with tracer.start_as_current_span(
+                    "gmail.send_batch",
+                    attributes={"gmail.messages": len(review_ids_by_request)},
+                ):
+                    batch.execute(http=authorized_http(creds))
+            except Exception as e:
+                for row in group:
+                    if row["review_id"] not in settled:
+                        self._outbox.mark_failed(row["review_id"], str(e))
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Returns the process-wide dispatcher, starting it on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = NotificationDispatcher(
+                    NotificationOutbox(settings.NOTIFICATION_OUTBOX_PATH),
+                    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+                    batch_window=settings.NOTIFICATION_BATCH_WINDOW_SECONDS,
+                    digest_window=settings.NOTIFICATION_DIGEST_WINDOW_SECONDS,
+                )
+    return _dispatcher
@@ -0,0 +1,20 @@
+import os
+import sqlite3
+
+
+def connect_private_sqlite(path: str, **kwargs) -> sqlite3.Connection:
+    """
+    Opens a SQLite file that only the current user can read. A missing parent
+    directory is created with mode 0700. The file is created with mode 0600
+    before SQLite opens it, and SQLite gives its -wal and -shm files the mode
+    of the database file. Files left with a wider mode by older versions are
+    restricted as well.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    flags = os.O_CREAT | os.O_RDWR | getattr(os, "O_NOFOLLOW", 0)
+    os.close(os.open(path, flags, 0o600))
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.chmod(path + suffix, 0o600)
+    return sqlite3.connect(path, **kwargs)
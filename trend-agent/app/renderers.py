@@ -0,0 +1,409 @@
+import io
+from copy import deepcopy
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.oxml.table import CT_Tbl
+from docx.shared import Pt
+from docx.text.paragraph import Paragraph as DocxParagraph
+from fpdf import FPDF
+from lxml import etree
+
+from .markdown_blocks import (
+    Block,
+    CodeBlock,
+    Heading,
+    ListBlock,
+    Paragraph,
+    Quote,
+    Rule,
+    Span,
+    Table,
+)
+
+PT_TO_MM = 25.4 / 72
+BODY_SIZE = 11.0
+HEADING_SIZES = {1: 20.0, 2: 16.0, 3: 14.0}  # deeper levels use 12pt
+LINE_SPACING = 1.4
+LIST_INDENT = 6.0  # mm per nesting level
+CELL_PADDING = 1.5  # mm
+FONT_STYLES = {"": "Regular", "B": "Bold", "I": "Italic", "BI": "BoldItalic"}
+
+# Advance width of each character at 1pt, per (font file, style). Filled
+# lazily and shared by every document rendered in this process.
+_glyph_widths: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+Line = List[Tuple[str, str]]  # (style, text) runs that fit on one line
+
+
+def _style(span: Span) -> str:
+    return ("B" if span.bold else "") + ("I" if span.italic else "")
+
+
+def _font_files(font_path: Path) -> Dict[str, Path]:
+    """
+    Regular/bold/italic files, e.g. `OpenSans-Bold.ttf` next to
+    `OpenSans.ttf`. Only the regular style and styles with a file of their
+    own are listed.
+    """
+    files = {"": font_path}
+    for style, suffix in FONT_STYLES.items():
+        candidate = font_path.with_name(f"{font_path.stem}-{suffix}{font_path.suffix}")
+        if style and candidate.exists():
+            files[style] = candidate
+    return files
+
+
+class PdfLayout:
+    """
+    Lays blocks out line by line onto FPDF pages.
+
+    Line breaking uses per-character widths measured once per font and
+    cached across documents, and text is placed with `FPDF.text`, so the
+    cost grows linearly with report length. Pages are added as soon as the
+    next line or table row would not fit.
+    """
+
+    def __init__(self, font_path: Path):
+        self.pdf = FPDF()
+        self.pdf.set_auto_page_break(False)
+        self._files = _font_files(font_path)
+        for style, path in self._files.items():
+            self.pdf.add_font("Report", style, str(path))
+        # Styles without a file of their own are set in the regular face, so
+        # each file is parsed and embedded once.
+        self._faces = {
+            style: style if style in self._files else "" for style in FONT_STYLES
+        }
+        self._size = BODY_SIZE
+        self._style: Optional[str] = None
+        self.pdf.add_page()
+        self.y = self.pdf.t_margin
+
+    # -- measurement -------------------------------------------------------
+
+    def _widths(self, style: str) -> Dict[str, float]:
+        face = self._faces[style]
+        return _glyph_widths.setdefault((str(self._files[face]), face), {})
+
+    def text_width(self, text: str, style: str, size: float) -> float:
+        widths = self._widths(style)
+        total = 0.0
+        for char in text:
+            width = widths.get(char)
+            if width is None:
+                self._set_font(style, 1.0)
+                width = widths[char] = self.pdf.get_string_width(char)
+            total += width
+        return total * size
+
+    def wrap(self, spans: List[Span], width: float, size: float) -> List[Line]:
+        """Greedy word wrap of styled spans into lines no wider than `width`."""
+        lines: List[Line] = []
+        line: Line = []
+        line_width = 0.0
+        space_pending = False
+        for span in spans:
+            style = _style(span)
+            space_width = self.text_width(" ", style, size)
+            for index, word in enumerate(span.text.split(" ")):
+                if index:
+                    space_pending = True
+                if not word:
+                    continue
+                word_width = self.text_width(word, style, size)
+                gap = space_width if space_pending and line else 0.0
+                if line and line_width + gap + word_width > width:
+                    lines.append(line)
+                    line, line_width, gap = [], 0.0, 0.0
+                while word_width > width and len(word) > 1:
+                    # A word wider than the whole line is split by character.
+                    cut = len(word) - 1
+                    while cut > 1 and self.text_width(word[:cut], style, size) > width:
+                        cut -= 1
+                    lines.append([(style, word[:cut])])
+                    word = word[cut:]
+                    word_width = self.text_width(word, style, size)
+                text = (" " if gap else "") + word
+                if line and line[-1][0] == style:
+                    line[-1] = (style, line[-1][1] + text)
+                else:
+                    line.append((style, text))
+                line_width += gap + word_width
+                space_pending = False
+        if line:
+            lines.append(line)
+        return lines
+
+    # -- emission ----------------------------------------------------------
+
+    def _set_font(self, style: str, size: float) -> None:
+        face = self._faces[style]
+        if face != self._style or size != self._size:
+            self.pdf.set_font("Report", face, size)
+            self._style, self._size = face, size
+
+    def _line_height(self, size: float) -> float:
+        return size * PT_TO_MM * LINE_SPACING
+
+    def ensure_space(self, height: float) -> bool:
+        """Starts a new page if `height` doesn't fit; True if it did."""
+        if self.y + height > self.pdf.h - self.pdf.b_margin:
+            self.pdf.add_page()
+            self.y = self.pdf.t_margin
+            return True
+        return False
+
+    def emit_line(self, line: Line, x: float, size: float) -> None:
+        height = self._line_height(size)
+        self.ensure_space(height)
+        baseline = self.y + height * 0.75
+        for style, text in line:
+            self._set_font(style, size)
+            self.pdf.text(x, baseline, text)
+            x += self.text_width(text, style, size)
+        self.y += height
+
+    def emit_spans(
+        self, spans: List[Span], size: float = BODY_SIZE, indent: float = 0.0
+    ) -> None:
+        x = self.pdf.l_margin + indent
+        for line in self.wrap(spans, self.pdf.epw - indent, size):
+            self.emit_line(line, x, size)
+
+    def space(self, size: float = BODY_SIZE) -> None:
+        self.y += self._line_height(size) * 0.5
+
+    def emit_table(self, table: Table) -> None:
+        columns = max(len(table.header), 1)
+        column_width = self.pdf.epw / columns
+        text_width = column_width - 2 * CELL_PADDING
+        line_height = self._line_height(BODY_SIZE)
+
+        def layout_row(cells: List[List[Span]], bold: bool):
+            if bold:
+                cells = [[span._replace(bold=True) for span in cell] for cell in cells]
+            wrapped = [self.wrap(cell, text_width, BODY_SIZE) for cell in cells]
+            lines = max((len(cell_lines) for cell_lines in wrapped), default=1)
+            return wrapped, max(lines, 1) * line_height + 2 * CELL_PADDING
+
+        header = layout_row(table.header, bold=True)
+        self.ensure_space(header[1])
+        self._draw_row(*header, column_width, line_height, fill=True)
+        for row in table.rows:
+            wrapped, height = layout_row(row, bold=False)
+            if self.ensure_space(height):
+                # Repeat the header on every page the table spans.
+                self._draw_row(*header, column_width, line_height, fill=True)
+            self._draw_row(wrapped, height, column_width, line_height, fill=False)
+
+    def _draw_row(
+        self,
+        wrapped: List[List[Line]],
+        height: float,
+        column_width: float,
+        line_height: float,
+        fill: bool,
+    ) -> None:
+        self.pdf.set_fill_color(235, 238, 242)
+        top = self.y
+        for column, cell_lines in enumerate(wrapped):
+            x = self.pdf.l_margin + column * column_width
+            self.pdf.rect(x, top, column_width, height, style="DF" if fill else "D")
+            self.y = top + CELL_PADDING
+            for line in cell_lines:
+                baseline = self.y + line_height * 0.75
+                cursor = x + CELL_PADDING
+                for style, text in line:
+                    self._set_font(style, BODY_SIZE)
+                    self.pdf.text(cursor, baseline, text)
+                    cursor += self.text_width(text, style, BODY_SIZE)
+                self.y += line_height
+        self.y = top + height
+
+    def render(self, blocks: List[Block]) -> bytes:
+        for block in blocks:
+            if isinstance(block, Heading):
+                size = HEADING_SIZES.get(block.level, 12.0)
+                self.space(size)
+                # Keep a heading on the same page as the first line after it.
+                self.ensure_space(
+                    self._line_height(size) + self._line_height(BODY_SIZE)
+                )
+                self.emit_spans([s._replace(bold=True) for s in block.spans], size)
+                self.y += self._line_height(BODY_SIZE) * 0.25
+            elif isinstance(block, Paragraph):
+                self.emit_spans(block.spans)
+                self.space()
+            elif isinstance(block, ListBlock):
+                counters: Dict[int, int] = {}
+                for depth, spans in block.items:
+                    counters = {d: n for d, n in counters.items() if d <= depth}
+                    counters[depth] = counters.get(depth, 0) + 1
+                    marker = f"{counters[depth]}." if block.ordered else "•"
+                    indent = LIST_INDENT * (depth + 1)
+                    self.emit_spans([Span(f"{marker} ")] + spans, indent=indent - 4)
+                self.space()
+            elif isinstance(block, Table):
+                self.emit_table(block)
+                self.space()
+            elif isinstance(block, CodeBlock):
+                for code_line in block.text.splitlines() or [""]:
+                    self.emit_spans([Span(code_line, code=True)], indent=LIST_INDENT)
+                self.space()
+            elif isinstance(block, Quote):
+                self.emit_spans(
+                    [s._replace(italic=True) for s in block.spans], indent=LIST_INDENT
+                )
+                self.space()
+            elif isinstance(block, Rule):
+                self.ensure_space(self._line_height(BODY_SIZE))
+                middle = self.y + self._line_height(BODY_SIZE) / 2
+                self.pdf.line(
+                    self.pdf.l_margin, middle, self.pdf.w - self.pdf.r_margin, middle
+                )
+                self.y += self._line_height(BODY_SIZE)
+        return bytes(self.pdf.output())
+
+
+def render_pdf(blocks: List[Block], font_path: Path) -> bytes:
+    return PdfLayout(font_path).render(blocks)
+
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+_RUN = qn("w:r")
+_TEXT = qn("w:t")
+
+
+@lru_cache(maxsize=None)
+def _run_properties(bold: bool, italic: bool, code: bool):
+    """`w:rPr` template for a span style, or None for plain text."""
+    if not (bold or italic or code):
+        return None
+    properties = OxmlElement("w:rPr")
+    if code:
+        fonts = {qn("w:ascii"): "Consolas", qn("w:hAnsi"): "Consolas"}
+        properties.append(OxmlElement("w:rFonts", fonts))
+    if bold:
+        properties.append(OxmlElement("w:b"))
+    if italic:
+        properties.append(OxmlElement("w:i"))
+    return properties
+
+
+def _add_runs(paragraph, spans: List[Span]) -> None:
+    """
+    Appends a `w:r` per span to the paragraph's XML. The run properties are
+    copied from a template per style, because python-docx's `add_run` and
+    `bold`/`italic` setters look up each child's position with XPath and
+    took most of the time on long reports.
+    """
+    p = paragraph._p
+    for span in spans:
+        if "\t" in span.text or "\n" in span.text:
+            # python-docx turns these into w:tab and w:br elements.
+            run = paragraph.add_run(span.text)
+            run.bold, run.italic = span.bold or None, span.italic or None
+            if span.code:
+                run.font.name = "Consolas"
+            continue
+        # SubElement reuses the document's namespace declarations, which
+        # OxmlElement would resolve again for every element.
+        run = etree.SubElement(p, _RUN)
+        properties = _run_properties(span.bold, span.italic, span.code)
+        if properties is not None:
+            run.append(deepcopy(properties))
+        text = etree.SubElement(run, _TEXT)
+        text.text = span.text
+        if span.text != span.text.strip():
+            text.set(_XML_SPACE, "preserve")
+
+
+class _DocxStyles:
+    """
+    Resolves style names to ids once per document. Assigning a style by name
+    makes python-docx scan every style in the document for each paragraph,
+    which dominates the cost of long reports.
+    """
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._ids: Dict[str, str] = {}
+        self._paragraph_properties: Dict[str, Any] = {}
+        self._section_properties = doc.element.body.sectPr
+        # python-docx recomputes this from the last section for every table.
+        self._block_width = doc._block_width
+
+    def style_id(self, style_name: str) -> str:
+        if style_name not in self._ids:
+            self._ids[style_name] = self._doc.styles[style_name].style_id
+        return self._ids[style_name]
+
+    def paragraph(self, style_name: Optional[str] = None):
+        # Built and placed before the section properties directly: python-docx
+        # finds that position, and each property's, with an XPath query.
+        p = OxmlElement("w:p")
+        if style_name:
+            if style_name not in self._paragraph_properties:
+                properties = OxmlElement("w:pPr")
+                properties.append(
+                    OxmlElement("w:pStyle", {qn("w:val"): self.style_id(style_name)})
+                )
+                self._paragraph_properties[style_name] = properties
+            p.append(deepcopy(self._paragraph_properties[style_name]))
+        self._section_properties.addprevious(p)
+        return self.wrap(p)
+
+    def wrap(self, p) -> DocxParagraph:
+        return DocxParagraph(p, self._doc._body)
+
+    def table(self, rows: int, columns: int, style_name: str) -> CT_Tbl:
+        """A `w:tbl` with an empty paragraph in each cell."""
+        table = CT_Tbl.new_tbl(rows, columns, self._block_width)
+        table.tblStyle_val = self.style_id(style_name)
+        self._section_properties.addprevious(table)
+        return table
+
+
+def render_docx(blocks: List[Block], report_title: str) -> bytes:
+    doc = Document()
+    doc.add_heading(report_title, 0)
+    styles = _DocxStyles(doc)
+    for block in blocks:
+        if isinstance(block, Heading):
+            _add_runs(styles.paragraph(f"Heading {block.level}"), block.spans)
+        elif isinstance(block, Paragraph):
+            _add_runs(styles.paragraph(), block.spans)
+        elif isinstance(block, ListBlock):
+            base = "List Number" if block.ordered else "List Bullet"
+            for depth, spans in block.items:
+                # The default template defines levels 1-3 of each list style.
+                level = min(depth, 2)
+                style = base if level == 0 else f"{base} {level + 1}"
+                _add_runs(styles.paragraph(style), spans)
+        elif isinstance(block, Table):
+            columns = max(len(block.header), 1)
+            table = styles.table(len(block.rows) + 1, columns, "Table Grid")
+            # The cells are walked in the XML; `Row.cells` rebuilds the grid.
+            for index, (row, cells) in enumerate(
+                zip(table.tr_lst, [block.header] + block.rows)
+            ):
+                for cell, spans in zip(row.tc_lst, cells):
+                    if index == 0:
+                        spans = [span._replace(bold=True) for span in spans]
+                    _add_runs(styles.wrap(cell.p_lst[0]), spans)
+        elif isinstance(block, CodeBlock):
+            run = styles.paragraph().add_run(block.text)
+            run.font.name = "Consolas"
+            run.font.size = Pt(9)
+        elif isinstance(block, Quote):
+            _add_runs(styles.paragraph("Quote"), block.spans)
+        elif isinstance(block, Rule):
+            styles.paragraph().add_run("—" * 20)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
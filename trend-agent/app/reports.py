@@ -0,0 +1,394 @@
+import hashlib
+import io
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from google.cloud import storage
+from google.oauth2.credentials import Credentials
+from googleapiclient.http import MediaIoBaseUpload
+
+from .config import settings
+from .google_clients import authorized_http, get_service, get_storage_client
+from .markdown_blocks import Block, parse_markdown
+from .renderers import render_docx, render_pdf
+from .tracing import submit, tracer
+
+FONT_PATH = Path(__file__).parent.resolve() / "OpenSans.ttf"
+
+# Part of every artifact key; bump it when renderer output changes so saved
+# artifacts are not reused for different bytes.
+RENDER_VERSION = "2"
+# Hex characters of the artifact key used in GCS object names.
+ARTIFACT_KEY_CHARS = 32
+
+# Long-lived pools so worker threads (and their per-thread transports) are
+# reused across tool calls instead of being recreated for every save.
+_render_executor = ThreadPoolExecutor(
+    max_workers=3, thread_name_prefix="report-render"  # one per output format
+)
+_upload_executor = ThreadPoolExecutor(
+    max_workers=settings.REPORT_UPLOAD_CONCURRENCY,
+    thread_name_prefix="report-upload",
+)
+
+
+# Called with (target, suffix, link) as each report link becomes available.
+LinkCallback = Callable[[str, str, str], None]
+
+MIME_TYPES = {
+    ".md": "text/markdown",
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+class RenderedReport:
+    """
+    A rendered report format. Kept in memory unless it exceeds
+    `REPORT_SPILL_THRESHOLD_BYTES`, in which case it is spilled to a private
+    temp file. `open()` returns an independent reader so uploads can run
+    concurrently.
+    """
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.size = len(data)
+        self.mimetype = MIME_TYPES.get(Path(name).suffix, "application/octet-stream")
+        self._data: Optional[bytes] = data
+        self._path: Optional[str] = None
+        if self.size > settings.REPORT_SPILL_THRESHOLD_BYTES:
+            with tempfile.NamedTemporaryFile(
+                prefix="report_", suffix=Path(name).suffix, delete=False
+            ) as spill_file:
+                spill_file.write(data)
+            self._path = spill_file.name
+            self._data = None
+
+    def open(self) -> BinaryIO:
+        if self._data is not None:
+            return io.BytesIO(self._data)
+        return open(self._path, "rb")
+
+    def cleanup(self) -> None:
+        if self._path is not None:
+            Path(self._path).unlink(missing_ok=True)
+            self._path = None
+
+
+def _render_markdown(
+    report_markdown: str, report_title: str, blocks: List[Block]
+) -> bytes:
+    return report_markdown.encode("utf-8")
+
+
+def _render_pdf(report_markdown: str, report_title: str, blocks: List[Block]) -> bytes:
+    return render_pdf(blocks, FONT_PATH)
+
+
+def _render_docx(
+    report_markdown: str, report_title: str, blocks: List[Block]
+) -> bytes:
+    return render_docx(blocks, report_title)
+
+
+# Output formats keyed by file suffix, in the order they are reported back.
+# Each renderer gets the markdown, the title and the parsed blocks.
+RENDERERS: Dict[str, Callable[[str, str, List[Block]], bytes]] = {
+    ".md": _render_markdown,
+    ".pdf": _render_pdf,
+    ".docx": _render_docx,
+}
+
+
+def render_reports(
+    report_markdown: str,
+    report_title: str,
+    title_slug: str,
+    suffixes: Optional[Iterable[str]] = None,
+) -> Dict[str, RenderedReport]:
+    """
+    Renders the requested formats (all by default) concurrently. Raises if
+    any renderer fails.
+    """
+    # Parsed once here and shared by the PDF and DOCX renderers.
+    with tracer.start_as_current_span("reports.parse"):
+        blocks = parse_markdown(report_markdown)
+
+    def render(suffix: str) -> bytes:
+        with tracer.start_as_current_span(
+            "reports.render", attributes={"report.format": suffix}
+        ):
+            return RENDERERS[suffix](report_markdown, report_title, blocks)
+
+    futures = {
+        suffix: submit(_render_executor, render, suffix)
+        for suffix in (RENDERERS if suffixes is None else suffixes)
+    }
+    reports: Dict[str, RenderedReport] = {}
+    try:
+        for suffix, future in futures.items():
+            data = future.result()
+            reports[suffix] = RenderedReport(f"{title_slug}{suffix}", data)
+    except Exception:
+        for report in reports.values():
+            report.cleanup()
+        raise
+    return reports
+
+
+def artifact_key(report_markdown: str, report_title: str, suffix: str) -> str:
+    """Content address of one rendered format."""
+    digest = hashlib.sha256()
+    for part in (RENDER_VERSION, suffix, report_title, report_markdown):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ArtifactIndex:
+    """
+    In-process LRU of links to artifacts that were already uploaded, keyed
+    by (target, artifact key, owner). GCS links are shared, so their owner
+    is empty; Drive files belong to the user who uploaded them.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._links: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, target: str, key: str, owner: str) -> Optional[str]:
+        with self._lock:
+            link = self._links.get((target, key, owner))
+            if link is not None:
+                self._links.move_to_end((target, key, owner))
+            return link
+
+    def put(self, target: str, key: str, owner: str, link: str) -> None:
+        with self._lock:
+            self._links[(target, key, owner)] = link
+            self._links.move_to_end((target, key, owner))
+            while len(self._links) > self._max_size:
+                self._links.popitem(last=False)
+
+
+_artifact_index = ArtifactIndex(settings.ARTIFACT_INDEX_SIZE)
+
+
+def _drive_link_field(owner: str) -> str:
+    # Metadata keys are visible to anyone who can read the object, so the
+    # owner is hashed.
+    return f"drive-link-{hashlib.sha256(owner.encode('utf-8')).hexdigest()[:16]}"
+
+
+def save_reports(
+    report_markdown: str,
+    report_title: str,
+    title_slug: str,
+    creds: Credentials,
+    owner: str,
+    on_link: Optional[LinkCallback] = None,
+) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, Dict[str, str]]]:
+    """
+    Renders and uploads every format to GCS and Drive, skipping any artifact
+    that was already uploaded for this exact content. `on_link(target,
+    suffix, link)` is called on this thread as each link becomes known:
+    right away for reused artifacts, then as each upload finishes.
+
+    GCS objects are content-addressed (`reports/<key>/<name>`) and carry
+    their key and the Drive links of their owners as object metadata; the
+    in-process `ArtifactIndex` answers repeated saves without a request.
+    Only formats with a missing upload are rendered, so a retry after a
+    partial failure re-sends just what failed. Returns the GCS links, the
+    Drive links and the per-target errors, each keyed by file suffix.
+    """
+    keys = {
+        suffix: artifact_key(report_markdown, report_title, suffix)
+        for suffix in RENDERERS
+    }
+    owners = {"gcs": "", "drive": owner}
+    links: Dict[str, Dict[str, str]] = {"gcs": {}, "drive": {}}
+    for target in links:
+        for suffix, key in keys.items():
+            link = _artifact_index.get(target, key, owners[target])
+            if link is not None:
+                links[target][suffix] = link
+
+    bucket = get_storage_client(creds).bucket(
+        settings.STAGING_BUCKET.replace("gs://", "")
+    )
+    blob_names = {
+        suffix: f"reports/{key[:ARTIFACT_KEY_CHARS]}/{title_slug}{suffix}"
+        for suffix, key in keys.items()
+    }
+    drive_field = _drive_link_field(owner)
+
+    # Fall back to the object metadata for anything this process hasn't seen.
+    unresolved = [
+        suffix
+        for suffix in RENDERERS
+        if suffix not in links["gcs"] or suffix not in links["drive"]
+    ]
+
+    def lookup(suffix: str) -> Optional[storage.Blob]:
+        with tracer.start_as_current_span(
+            "gcs.get_blob", attributes={"report.format": suffix}
+        ):
+            return bucket.get_blob(blob_names[suffix])
+
+    lookups = {
+        suffix: submit(_upload_executor, lookup, suffix) for suffix in unresolved
+    }
+    for suffix, future in lookups.items():
+        try:
+            blob = future.result()
+        except Exception as e:
+            print(f"⚠️ Could not look up cached artifact {blob_names[suffix]}: {e}")
+            continue
+        metadata = (blob.metadata or {}) if blob is not None else {}
+        if metadata.get("content-sha256") != keys[suffix]:
+            continue
+        links["gcs"][suffix] = blob.public_url
+        if metadata.get(drive_field):
+            links["drive"].setdefault(suffix, metadata[drive_field])
+    if on_link is not None:
+        for suffix in RENDERERS:
+            for target in links:
+                if suffix in links[target]:
+                    on_link(target, suffix, links[target][suffix])
+
+    pending = [
+        (target, suffix)
+        for suffix in RENDERERS
+        for target in links
+        if suffix not in links[target]
+    ]
+    errors: Dict[str, Dict[str, str]] = {}
+    if pending:
+        pending_suffixes = {suffix for _, suffix in pending}
+        reports = render_reports(
+            report_markdown,
+            report_title,
+            title_slug,
+            suffixes=[suffix for suffix in RENDERERS if suffix in pending_suffixes],
+        )
+        try:
+            uploaded, errors = upload_reports(
+                reports, creds, pending, bucket, blob_names, keys, on_link
+            )
+        finally:
+            for report in reports.values():
+                report.cleanup()
+        for target, suffix in uploaded:
+            links[target][suffix] = uploaded[target, suffix]
+        _record_drive_links(
+            bucket,
+            blob_names,
+            drive_field,
+            {
+                suffix: link
+                for (target, suffix), link in uploaded.items()
+                if target == "drive" and suffix in links["gcs"]
+            },
+        )
+
+    for target, links_for_target in links.items():
+        for suffix, link in links_for_target.items():
+            _artifact_index.put(target, keys[suffix], owners[target], link)
+    return links["gcs"], links["drive"], errors
+
+
+def _record_drive_links(
+    bucket: storage.Bucket,
+    blob_names: Dict[str, str],
+    drive_field: str,
+    drive_links: Dict[str, str],
+) -> None:
+    """Adds new Drive links to the artifacts' GCS metadata, best effort."""
+
+    def patch(suffix: str, link: str) -> None:
+        blob = bucket.blob(blob_names[suffix])
+        # Metadata patches merge with the keys already on the object.
+        blob.metadata = {drive_field: link}
+        with tracer.start_as_current_span(
+            "gcs.patch_metadata", attributes={"report.format": suffix}
+        ):
+            blob.patch()
+
+    futures = [
+        submit(_upload_executor, patch, suffix, link)
+        for suffix, link in drive_links.items()
+    ]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"⚠️ Could not record Drive link in artifact metadata: {e}")
+
+
+def upload_reports(
+    reports: Dict[str, RenderedReport],
+    creds: Credentials,
+    pending: Iterable[Tuple[str, str]],
+    bucket: storage.Bucket,
+    blob_names: Dict[str, str],
+    keys: Dict[str, str],
+    on_link: Optional[LinkCallback] = None,
+) -> Tuple[Dict[Tuple[str, str], str], Dict[str, Dict[str, str]]]:
+    """
+    Uploads the `pending` (target, suffix) pairs on a bounded thread pool,
+    streaming straight from the in-memory (or spilled) buffers.
+
+    A failed upload does not cancel the others; `on_link` is called for each
+    one that succeeds, in completion order. Returns the links keyed by
+    (target, suffix) and the per-target errors keyed by file suffix.
+    """
+    drive_service = get_service("drive", "v3", creds)
+
+    def upload_to_gcs(suffix: str, report: RenderedReport) -> str:
+        blob = bucket.blob(blob_names[suffix])
+        blob.metadata = {"content-sha256": keys[suffix]}
+        with report.open() as stream:
+            blob.upload_from_file(
+                stream, size=report.size, content_type=report.mimetype
+            )
+        return blob.public_url
+
+    def upload_to_drive(suffix: str, report: RenderedReport) -> str:
+        with report.open() as stream:
+            media = MediaIoBaseUpload(stream, mimetype=report.mimetype, resumable=True)
+            request = drive_service.files().create(
+                body={"name": report.name}, media_body=media, fields="webViewLink"
+            )
+            # httplib2 is not thread-safe, so each worker uses its own transport.
+            return request.execute(http=authorized_http(creds)).get("webViewLink")
+
+    targets = {"gcs": upload_to_gcs, "drive": upload_to_drive}
+
+    def upload(target: str, suffix: str) -> str:
+        with tracer.start_as_current_span(
+            f"{target}.upload",
+            attributes={"report.format": suffix, "report.bytes": reports[suffix].size},
+        ):
+            return targets[target](suffix, reports[suffix])
+
+    futures = {
+        submit(_upload_executor, upload, target, suffix): (target, suffix)
+        for target, suffix in pending
+    }
+    links: Dict[Tuple[str, str], str] = {}
+    errors: Dict[str, Dict[str, str]] = {}
+    for future in as_completed(futures):
+        target, suffix = futures[future]
+        try:
+            links[target, suffix] = future.result()
+        except Exception as e:
+            errors.setdefault(target, {})[suffix] = str(e)
+            continue
+        if on_link is not None:
+            on_link(target, suffix, links[target, suffix])
+    return links, errors
@@ -0,0 +1,170 @@
+import asyncio
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+from google.adk.tools import ToolContext
+from google.adk.tools.agent_tool import AgentTool
+from opentelemetry import trace
+
+from .config import settings
+from .research_cache import get_research_cache, query_key
+from .subagents import research_agent
+from .tracing import tracer
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class CachedAgentTool(AgentTool):
+    """
+    AgentTool that answers a request seen recently (after normalization) from
+    the research cache instead of running the agent and its searches again.
+    Identical requests that arrive while one is running wait for its result.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending: Dict[str, "asyncio.Future[Any]"] = {}
+
+    async def run_async(
+        self, *, args: Dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        cache = get_research_cache()
+        query = str(args.get("request") or "")
+        if cache is None or not query:
+            return await super().run_async(args=args, tool_context=tool_context)
+        span = trace.get_current_span()
+        key = query_key(query)
+        pending = self._pending.get(key)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            await asyncio.wait({pending})
+            # If that run failed, this request runs the agent itself.
+            if not pending.cancelled():
+                cache.record(hit=True)
+                span.set_attribute("research.cache_hit", True)
+                return pending.result()
+        findings = cache.get(query)
+        span.set_attribute("research.cache_hit", findings is not None)
+        if findings is not None:
+            return findings
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = await super().run_async(args=args, tool_context=tool_context)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._pending.pop(key, None)
+        future.set_result(result)
+        if isinstance(result, str) and result.strip():
+            cache.put(query, result)
+        return result
+
+
+# Runs the research sub-agent for one query, in its own child session. Both
+# research modes go through it, so both share the cache.
+research_agent_tool = CachedAgentTool(agent=research_agent)
+
+
+def research_tool_name() -> str:
+    """Name of the research tool the root agent has in the configured mode."""
+    if settings.RESEARCH_MODE == "fanout":
+        return "research_topic"
+    return research_agent.name
+
+
+def _normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def unique_queries(queries: Sequence[str], limit: int) -> List[str]:
+    """Drops blank and repeated queries, ignoring case and punctuation."""
+    seen = set()
+    result = []
+    for query in queries:
+        key = _normalize(query)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(query.strip())
+    return result[:limit]
+
+
+def merge_findings(findings: Sequence[Tuple[str, str]]) -> str:
+    """
+    Merges (query, findings) pairs into one document with a section per query.
+    Sentences already seen in an earlier section are dropped, then headings
+    left without content, then sections left empty.
+    """
+    seen = set()
+    sections = []
+    for query, text in findings:
+        lines: List[str] = []
+        for line in text.splitlines():
+            if not line.strip() or line.lstrip().startswith("#"):
+                lines.append(line.rstrip())
+                continue
+            marker = _LIST_MARKER.match(line)
+            prefix = marker.group(0) if marker else ""
+            kept = []
+            for sentence in _SENTENCE_END.split(line[len(prefix) :].strip()):
+                key = _normalize(sentence)
+                if key and key not in seen:
+                    seen.add(key)
+                    kept.append(sentence)
+            if kept:
+                lines.append(prefix + " ".join(kept))
+        # Walk backwards so a heading is kept only if content follows it.
+        body: List[str] = []
+        has_content = False
+        for line in reversed(lines):
+            if line.lstrip().startswith("#"):
+                if has_content:
+                    body.append(line)
+                has_content = False
+            elif line:
+                body.append(line)
+                has_content = True
+            elif body and body[-1]:
+                body.append(line)
+        text = "\n".join(reversed(body)).strip()
+        if text:
+            sections.append(f"### Findings for: {query}\n\n{text}")
+    return "\n\n".join(sections)
+
+
+async def fan_out(
+    queries: Sequence[str], tool_context: ToolContext
+) -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+    """
+    Runs the research sub-agent once per query, at most
+    `RESEARCH_CONCURRENCY` at a time. Returns (query, findings) pairs in query
+    order, and the error for each query that failed.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.RESEARCH_CONCURRENCY))
+
+    async def run(query: str) -> str:
+        async with semaphore:
+            with tracer.start_as_current_span(
+                "research.query", attributes={"research.query": query}
+            ):
+                result = await research_agent_tool.run_async(
+                    args={"request": query}, tool_context=tool_context
+                )
+        return str(result or "")
+
+    results = await asyncio.gather(
+        *(run(query) for query in queries), return_exceptions=True
+    )
+    findings = []
+    errors = {}
+    for query, result in zip(queries, results):
+        if isinstance(result, Exception):
+            errors[query] = str(result)
+        elif result.strip():
+            findings.append((query, result))
+        else:
+            errors[query] = "No findings returned."
+    return findings, errors
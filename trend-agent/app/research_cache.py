@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .classifier import normalize
+from .config import settings
+from .private_files import connect_private_sqlite
+
+# Words that don't change what a search query asks for.
+_STOPWORDS = frozenset(
+    ("a", "an", "and", "for", "in", "of", "on", "the", "to", "what", "latest")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS research_cache (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    findings TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS research_cache_used ON research_cache (used_at);
+"""
+
+
+def query_key(query: str) -> str:
+    """
+    Cache key of a search query: stemmed, lower-cased words without
+    punctuation or stopwords, so "EV market trends 2024" and "Latest EV
+    market trend, 2024" share an entry.
+    """
+    return " ".join(stem for stem in normalize(query) if stem not in _STOPWORDS)
+
+
+class ResearchCache(ABC):
+    """
+    Research findings by normalized query, expiring `ttl` seconds after they
+    were stored and evicted least recently used beyond `max_entries`. Hit and
+    miss counts are per process.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[str]:
+        findings = self._get(query_key(query), time.time())
+        self.record(hit=findings is not None)
+        return findings
+
+    def record(self, hit: bool) -> None:
+        """Counts a lookup; callers that serve a query another way count it too."""
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, query: str, findings: str) -> None:
+        self._put(query_key(query), query, findings, time.time())
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counts."""
+        self._clear()
+        with self._stats_lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses, "size": self._size()}
+
+    @abstractmethod
+    def _get(self, key: str, now: float) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _put(self, key: str, query: str, findings: str, now: float) -> None:
+        ...
+
+    @abstractmethod
+    def _size(self) -> int:
+        ...
+
+    @abstractmethod
+    def _clear(self) -> None:
+        ...
+
+
+class InMemoryResearchCache(ResearchCache):
+    """Process-local cache."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: str, query: str, findings: str, now: float) -> None:
+        with self._lock:
+            self._entries[key] = (now + self.ttl, findings)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResearchCache(ResearchCache):
+    """
+    SQLite cache shared by the agent processes on one host, and kept across
+    restarts.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        # Findings may quote what users asked about.
+        self._conn = connect_private_sqlite(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT findings FROM research_cache "
+                "WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE research_cache SET used_at = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def _put(self, key: str, query: str, findings: str, now: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO research_cache "
+                "(key, query, findings, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, query, findings, now + self.ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM research_cache WHERE expires_at <= ?", (now,)
+            )
+            # Evict least recently used rows beyond the bound.
+            self._conn.execute(
+                "DELETE FROM research_cache WHERE key IN (SELECT key FROM "
+                "research_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def _size(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM research_cache").fetchone()
+            return row[0]
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM research_cache")
+
+
+_cache: Optional[ResearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_research_cache() -> Optional[ResearchCache]:
+    """
+    Returns the process-wide cache selected by `RESEARCH_CACHE_BACKEND`
+    (`memory`, `sqlite` or `off`), or None when caching is off.
+    """
+    global _cache
+    backend = settings.RESEARCH_CACHE_BACKEND.lower()
+    if backend == "off" or settings.RESEARCH_CACHE_SIZE <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if backend == "memory":
+                    _cache = InMemoryResearchCache(
+                        settings.RESEARCH_CACHE_SIZE,
+                        settings.RESEARCH_CACHE_TTL_SECONDS,
+                    )
+                elif backend == "sqlite":
+                    _cache = SQLiteResearchCache(
+                        settings.RESEARCH_CACHE_PATH,
+                        settings.RESEARCH_CACHE_SIZE,
+                        settings.RESEARCH_CACHE_TTL_SECONDS,
+                    )
+                else:
+                    raise ValueError(f"Unknown RESEARCH_CACHE_BACKEND: {backend}")
+    return _cache
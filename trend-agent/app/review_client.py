@@ -0,0 +1,497 @@
+import asyncio
+import difflib
+import hashlib
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict, deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import httpx
+import requests
+from opentelemetry import trace
+from requests.adapters import HTTPAdapter
+
+from .config import settings
+from .tracing import inject_headers, tracer
+
+# Status codes worth retrying for idempotent calls. A 502/503/504 does not prove
+# the review app skipped the request, so a POST could already have created a
+# review; only a 429 (rejected before processing) is retried for those.
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+NON_IDEMPOTENT_RETRYABLE_STATUS_CODES = {429}
+# Extra read time granted on top of a long-poll so the socket outlives the wait.
+LONG_POLL_READ_MARGIN_SECONDS = 5.0
+# Number of recent samples kept per operation for percentile reporting.
+LATENCY_WINDOW_SIZE = 1024
+# Number of status bodies remembered for conditional (ETag) requests.
+ETAG_CACHE_SIZE = 256
+
+LatencyHook = Callable[[str, float, Optional[int]], None]
+
+
+class ReviewServiceError(Exception):
+    """Raised when the review service cannot be reached or returns an error."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LatencyRecorder:
+    """Keeps a rolling window of request latencies per operation."""
+
+    def __init__(self, window_size: int = LATENCY_WINDOW_SIZE):
+        self._samples: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window_size)
+        )
+        self._hooks: List[LatencyHook] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: LatencyHook) -> None:
+        """Registers a callable receiving (operation, seconds, status_code)."""
+        self._hooks.append(hook)
+
+    def record(
+        self, operation: str, seconds: float, status_code: Optional[int]
+    ) -> None:
+        with self._lock:
+            self._samples[operation].append(seconds)
+        for hook in self._hooks:
+            try:
+                hook(operation, seconds, status_code)
+            except Exception as e:
+                print(f"⚠️ Review client metrics hook failed: {e}")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns count, p50 and p99 latency (in seconds) per operation."""
+        with self._lock:
+            snapshot = {op: sorted(samples) for op, samples in self._samples.items()}
+        return {
+            op: {
+                "count": len(samples),
+                "p50": _percentile(samples, 0.50),
+                "p99": _percentile(samples, 0.99),
+            }
+            for op, samples in snapshot.items()
+            if samples
+        }
+
+
+class _ETagCache:
+    """Remembers the last body and ETag per URL path for conditional GETs."""
+
+    def __init__(self, max_size: int = ETAG_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def headers(self, path: str) -> Dict[str, str]:
+        with self._lock:
+            entry = self._entries.get(path)
+        return {"If-None-Match": entry[0]} if entry else {}
+
+    def cached_body(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(path)
+        return entry[1] if entry else None
+
+    def store(self, path: str, etag: Optional[str], body: Dict[str, Any]) -> None:
+        if not etag:
+            return
+        with self._lock:
+            self._entries[path] = (etag, body)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+
+def _line_patch(old: str, new: str) -> List[Dict[str, Any]]:
+    """Line edits turning `old` into `new`, in the review app's patch format."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        {"start": i1, "end": i2, "text": "".join(new_lines[j1:j2])}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _review_payloads(
+    outline: str,
+    highlights: Optional[List[Dict[str, Any]]],
+    parent_review_id: Optional[str],
+    parent_outline: Optional[str],
+) -> List[Dict[str, Any]]:
+    """
+    Request bodies to try in order for a new review. A revision is sent as a
+    patch against its parent's text first, with the full text as a fallback
+    for when the review app no longer has that exact parent text.
+    """
+    full = {
+        "outline": outline,
+        "highlights": highlights or [],
+        "tenant": settings.REVIEW_TENANT or settings.AGENT_NAME,
+    }
+    if not parent_review_id:
+        return [full]
+    full["parent_review_id"] = parent_review_id
+    if parent_outline is None:
+        return [full]
+    diff = {
+        "patch": _line_patch(parent_outline, outline),
+        "base_sha256": hashlib.sha256(parent_outline.encode("utf-8")).hexdigest(),
+        "parent_review_id": parent_review_id,
+        "highlights": full["highlights"],
+        "tenant": full["tenant"],
+    }
+    return [diff, full]
+
+
+def _retryable_status_codes(idempotent: bool) -> Set[int]:
+    if idempotent:
+        return RETRYABLE_STATUS_CODES
+    return NON_IDEMPOTENT_RETRYABLE_STATUS_CODES
+
+
+def _percentile(sorted_samples: List[float], fraction: float) -> float:
+    index = int(round(fraction * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    cap = settings.REVIEW_SERVICE_BACKOFF_SECONDS * (2**attempt)
+    return random.uniform(0, cap)
+
+
+def _wait_read_timeout(wait_timeout: float) -> float:
+    return max(
+        settings.REVIEW_SERVICE_READ_TIMEOUT,
+        wait_timeout + LONG_POLL_READ_MARGIN_SECONDS,
+    )
+
+
+# Shared across the sync and async clients so one hook sees all traffic.
+latency_recorder = LatencyRecorder()
+
+
+class ReviewServiceClient:
+    """
+    Blocking client for the review app with a pooled keep-alive session,
+    per-request timeouts and bounded, jittered retries.
+    """
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or settings.REVIEW_APP_BASE_URL).rstrip("/")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.REVIEW_SERVICE_POOL_SIZE
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._etags = _ETagCache()
+
+    def create_review(
+        self,
+        outline: str,
+        highlights: Optional[List[Dict[str, Any]]] = None,
+        parent_review_id: Optional[str] = None,
+        parent_outline: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Submits a review. Pass the previous review and the text it was decided
+        with to upload a revision as a diff.
+        """
+        *attempts, last = _review_payloads(
+            outline, highlights, parent_review_id, parent_outline
+        )
+        for payload in attempts:
+            try:
+                return self._request(
+                    "create_review", "POST", "/reviews", idempotent=False, json=payload
+                )
+            except ReviewServiceError as e:
+                if e.status_code != 409:
+                    raise
+        return self._request(
+            "create_review", "POST", "/reviews", idempotent=False, json=last
+        )
+
+    def get_status(self, review_id: str) -> Dict[str, Any]:
+        return self._request(
+            "get_status", "GET", f"/reviews/{review_id}/status", conditional=True
+        )
+
+    def wait_for_decision(self, review_id: str, timeout: float) -> Dict[str, Any]:
+        return self._request(
+            "wait_for_decision",
+            "GET",
+            f"/reviews/{review_id}/wait",
+            params={"timeout": timeout},
+            read_timeout=_wait_read_timeout(timeout),
+        )
+
+    def review_url(self, review_id: str) -> str:
+        return f"{self.base_url}/reviews/{review_id}/view"
+
+    def dashboard_url(self) -> str:
+        return f"{self.base_url}/dashboard"
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _request(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        idempotent: bool = True,
+        read_timeout: Optional[float] = None,
+        conditional: bool = False,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        timeout = (
+            settings.REVIEW_SERVICE_CONNECT_TIMEOUT,
+            read_timeout or settings.REVIEW_SERVICE_READ_TIMEOUT,
+        )
+        if conditional:
+            kwargs["headers"] = self._etags.headers(path)
+        with tracer.start_as_current_span(
+            f"review_service.{operation}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={"http.request.method": method, "url.path": path},
+        ) as span:
+            # The review app continues this trace from the `traceparent` header.
+            kwargs["headers"] = inject_headers(kwargs.get("headers"))
+            attempts = settings.REVIEW_SERVICE_MAX_RETRIES + 1
+            for attempt in range(attempts):
+                started = time.perf_counter()
+                status_code = None
+                try:
+                    response = self._session.request(
+                        method, f"{self.base_url}{path}", timeout=timeout, **kwargs
+                    )
+                    status_code = response.status_code
+                    if (
+                        status_code in _retryable_status_codes(idempotent)
+                        and attempt + 1 < attempts
+                    ):
+                        time.sleep(_backoff_delay(attempt))
+                        continue
+                    response.raise_for_status()
+                    if conditional and status_code == 304:
+                        cached = self._etags.cached_body(path)
+                        if cached is not None:
+                            return cached
+                        # Evicted since the request was sent: without the
+                        # entry the ETag isn't sent again, so this gets a body.
+                        return self._request(
+                            operation,
+                            method,
+                            path,
+                            idempotent,
+                            read_timeout,
+                            conditional,
+                            **kwargs,
+                        )
+                    body = response.json()
+                    if conditional:
+                        self._etags.store(path, response.headers.get("ETag"), body)
+                    return body
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    # Only connect failures are safe to retry for non-idempotent calls.
+                    retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                    if not retryable or attempt + 1 >= attempts:
+                        raise ReviewServiceError(str(e)) from e
+                    time.sleep(_backoff_delay(attempt))
+                except (requests.RequestException, ValueError) as e:
+                    raise ReviewServiceError(str(e), status_code) from e
+                finally:
+                    latency_recorder.record(
+                        operation, time.perf_counter() - started, status_code
+                    )
+                    span.set_attribute("review_service.attempts", attempt + 1)
+                    if status_code is not None:
+                        span.set_attribute("http.response.status_code", status_code)
+            raise ReviewServiceError(f"{operation} failed after {attempts} attempts.")
+
+
+class AsyncReviewServiceClient:
+    """Async counterpart of `ReviewServiceClient` for use from async callbacks."""
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or settings.REVIEW_APP_BASE_URL).rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=settings.REVIEW_SERVICE_POOL_SIZE,
+                max_keepalive_connections=settings.REVIEW_SERVICE_POOL_SIZE,
+            ),
+        )
+        self._etags = _ETagCache()
+
+    async def create_review(
+        self,
+        outline: str,
+        highlights: Optional[List[Dict[str, Any]]] = None,
+        parent_review_id: Optional[str] = None,
+        parent_outline: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        *attempts, last = _review_payloads(
+            outline, highlights, parent_review_id, parent_outline
+        )
+        for payload in attempts:
+            try:
+                return await self._request(
+                    "create_review", "POST", "/reviews", idempotent=False, json=payload
+                )
+            except ReviewServiceError as e:
+                if e.status_code != 409:
+                    raise
+        return await self._request(
+            "create_review", "POST", "/reviews", idempotent=False, json=last
+        )
+
+    async def get_status(self, review_id: str) -> Dict[str, Any]:
+        return await self._request(
+            "get_status", "GET", f"/reviews/{review_id}/status", conditional=True
+        )
+
+    async def wait_for_decision(
+        self, review_id: str, timeout: float
+    ) -> Dict[str, Any]:
+        return await self._request(
+            "wait_for_decision",
+            "GET",
+            f"/reviews/{review_id}/wait",
+            params={"timeout": timeout},
+            read_timeout=_wait_read_timeout(timeout),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        idempotent: bool = True,
+        read_timeout: Optional[float] = None,
+        conditional: bool = False,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        timeout = httpx.Timeout(
+            read_timeout or settings.REVIEW_SERVICE_READ_TIMEOUT,
+            connect=settings.REVIEW_SERVICE_CONNECT_TIMEOUT,
+        )
+        if conditional:
+            kwargs["headers"] = self._etags.headers(path)
+        with tracer.start_as_current_span(
+            f"review_service.{operation}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={"http.request.method": method, "url.path": path},
+        ) as span:
+            # The review app continues this trace from the `traceparent` header.
+            kwargs["headers"] = inject_headers(kwargs.get("headers"))
+            attempts = settings.REVIEW_SERVICE_MAX_RETRIES + 1
+            for attempt in range(attempts):
+                started = time.perf_counter()
+                status_code = None
+                try:
+                    response = await self._client.request(
+                        method, path, timeout=timeout, **kwargs
+                    )
+                    status_code = response.status_code
+                    if (
+                        status_code in _retryable_status_codes(idempotent)
+                        and attempt + 1 < attempts
+                    ):
+                        await asyncio.sleep(_backoff_delay(attempt))
+                        continue
+                    response.raise_for_status()
+                    if conditional and status_code == 304:
+                        cached = self._etags.cached_body(path)
+                        if cached is not None:
+                            return cached
+                        # Evicted since the request was sent: without the
+                        # entry the ETag isn't sent again, so this gets a body.
+                        return await self._request(
+                            operation,
+                            method,
+                            path,
+                            idempotent,
+                            read_timeout,
+                            conditional,
+                            **kwargs,
+                        )
+                    body = response.json()
+                    if conditional:
+                        self._etags.store(path, response.headers.get("ETag"), body)
+                    return body
+                except httpx.TransportError as e:
+                    # Only connect failures are safe to retry for non-idempotent calls.
+                    retryable = idempotent or isinstance(
+                        e, (httpx.ConnectError, httpx.ConnectTimeout)
+                    )
+                    if not retryable or attempt + 1 >= attempts:
+                        raise ReviewServiceError(str(e)) from e
+                    await asyncio.sleep(_backoff_delay(attempt))
+                except (httpx.HTTPError, ValueError) as e:
+                    raise ReviewServiceError(str(e), status_code) from e
+                finally:
+                    latency_recorder.record(
+                        operation, time.perf_counter() - started, status_code
+                    )
+                    span.set_attribute("review_service.attempts", attempt + 1)
+                    if status_code is not None:
+                        span.set_attribute("http.response.status_code", status_code)
+            raise ReviewServiceError(f"{operation} failed after {attempts} attempts.")
+
+
+_client_lock = threading.Lock()
+_client: Optional[ReviewServiceClient] = None
+# Keyed by the loop object, not its id(): a new loop can reuse a closed one's id.
+_async_clients: MutableMapping[
+    asyncio.AbstractEventLoop, AsyncReviewServiceClient
+] = weakref.WeakKeyDictionary()
+
+
+def get_review_client() -> ReviewServiceClient:
+    """Returns the process-wide blocking client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ReviewServiceClient()
+    return _client
+
+
+def get_async_review_client() -> AsyncReviewServiceClient:
+    """
+    Returns the async client bound to the running event loop. httpx pools are
+    tied to a loop, so each loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            # A client's open connections can keep its loop alive, so clients of
+            # closed loops are dropped here rather than left to the weak keys.
+            for closed in [other for other in _async_clients if other.is_closed()]:
+                del _async_clients[closed]
+            client = _async_clients[loop] = AsyncReviewServiceClient()
+    return client
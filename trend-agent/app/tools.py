@@ -1,35 +1,25 @@
-import base64
 import json
-from pathlib import Path
-import requests
-from email.message import EmailMessage
-from fpdf import FPDF
-from docx import Document
-
-from google.cloud import storage
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+
 from google.adk.tools import ToolContext
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from .config import settings
-from .auth_tools import get_authenticated_credentials
+from .auth_tool import context_session, get_authenticated_credentials
+from .classifier import get_topic_classifier
+from .compliance import get_competitor_matcher
+from .notifications import get_notification_dispatcher
+from .research import fan_out, merge_findings, unique_queries
+from .review_client import get_review_client
+from .tracing import traced
 
 REPORT_TEXT_STATE_KEY = "current_report_draft"
 VERIFICATION_REASONS_KEY = "verification_reasons"
+COMPETITOR_MATCHES_STATE_KEY = "competitor_matches"
 
 
+@traced()
 def classify_topic(topic: str) -> Dict[str, str]:
-    sensitive_keywords = [
-        "politics",
-        "conflict",
-        "finance",
-        "medical",
-        "danger",
-        "war",
-        "religion",
-    ]
-    if any(keyword in topic.lower() for keyword in sensitive_keywords):
+    if get_topic_classifier().match(topic):
         return {
             "classification": "sensitive",
             "reason": "The topic is sensitive and I cannot generate a market report on it.",
@@ -37,6 +27,35 @@ def classify_topic(topic: str) -> Dict[str, str]:
     return {"classification": "safe"}
 
 
+@traced()
+async def research_topic(
+    queries: List[str], tool_context: ToolContext
+) -> Dict[str, Any]:
+    """
+    Researches a topic from several angles at once. Pass 3-6 focused,
+    non-overlapping search queries; they run concurrently and the findings come
+    back merged, with repeated facts removed.
+    """
+    queries = unique_queries(queries, settings.RESEARCH_MAX_QUERIES)
+    if not queries:
+        return {"status": "error", "message": "Pass at least one search query."}
+    findings, errors = await fan_out(queries, tool_context)
+    if not findings:
+        return {
+            "status": "error",
+            "message": "All research queries failed.",
+            "errors": errors,
+        }
+    result = {
+        "status": "success" if not errors else "partial_success",
+        "findings": merge_findings(findings),
+    }
+    if errors:
+        result["errors"] = errors
+    return result
+
+
+@traced()
 def check_report_for_verification(
     report_text: str, tool_context: ToolContext
 ) -> Dict[str, Any]:
@@ -50,12 +69,17 @@ def check_report_for_verification(
         reasons.append(
             f"Report length ({len(cleaned_report_text)} chars) exceeds the limit of {settings.REPORT_CHAR_LIMIT_FOR_REVIEW}."
         )
-    for competitor in settings.COMPETITORS:
-        if competitor in cleaned_report_text.lower():
-            mentioned_competitors.append(competitor)
+    competitor_matches = get_competitor_matcher().scan(cleaned_report_text)
+    # Offsets let the review page highlight each mention for the reviewer.
+    tool_context.state[COMPETITOR_MATCHES_STATE_KEY] = [
+        match._asdict() for match in competitor_matches
+    ]
+    for match in competitor_matches:
+        if match.competitor not in mentioned_competitors:
+            mentioned_competitors.append(match.competitor)
     if mentioned_competitors:
         reasons.append(
-            f"Report mentions competitor(s): {', '.join(list(set(mentioned_competitors)))}."
+            f"Report mentions competitor(s): {', '.join(mentioned_competitors)}."
         )
     if reasons:
         return {"verification_needed": True, "reasons": reasons}
@@ -66,6 +90,7 @@ def check_report_for_verification(
         }
 
 
+@traced()
 def submit_report_for_verification(tool_context: ToolContext) -> Dict[str, Any]:
 
     report_to_review = tool_context.state.get(REPORT_TEXT_STATE_KEY)
@@ -83,86 +108,116 @@ def submit_report_for_verification(tool_context: ToolContext) -> Dict[str, Any]:
             "message": "Authentication is missing. The `authenticate_google_services` tool MUST be called successfully before using this tool.",
         }
     try:
-        response = requests.post(
-            f"{settings.REVIEW_APP_BASE_URL}/reviews",
-            json={"outline": report_to_review},
+        review_client = get_review_client()
+        parent = tool_context.state.get(settings.REPORT_PARENT_REVIEW_KEY) or {}
+        data = review_client.create_review(
+            report_to_review,
+            highlights=tool_context.state.get(COMPETITOR_MATCHES_STATE_KEY),
+            parent_review_id=parent.get("review_id"),
+            parent_outline=parent.get("outline"),
         )
-        response.raise_for_status()
-        data = response.json()
         review_id = data["review_id"]
-        review_url = f"{settings.REVIEW_APP_BASE_URL}/reviews/{review_id}/view"
-        gmail_service = build("gmail", "v1", credentials=creds)
-        message = EmailMessage()
-        message.set_content(
-            f"""A new market analysis report requires your verification.\n\nPlease review it here: {review_url}"""
-        )
-        message["To"] = settings.REVIEWER_EMAIL
-        message["Subject"] = f"""Market Report Needs Verification (ID: {review_id})"""
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        gmail_service.users().messages().send(
-            userId="me", body={"raw": encoded_message}
-        ).execute()
-        return {
-            "review_id": review_id,
-            "review_url": review_url,
-            "status": "pending_report_approval",
-        }
+        review_url = review_client.review_url(review_id)
+        # The review app assigns a reviewer from its pool, when it has one.
+        reviewer = data.get("reviewer") or settings.REVIEWER_EMAIL
     except Exception as e:
         return {"error": str(e), "status": "failed"}
+    result = {
+        "review_id": review_id,
+        "review_url": review_url,
+        "status": "pending_report_approval",
+    }
+    # The review exists now; the email is sent in the background and retried
+    # from the outbox, so a Gmail failure no longer fails the submission.
+    try:
+        get_notification_dispatcher().enqueue(
+            review_id,
+            recipient=reviewer,
+            subject=f"""Market Report Needs Verification (ID: {review_id})""",
+            body=f"""A new market analysis report requires your verification.\n\nPlease review it here: {review_url}""",
+            creds=creds,
+            review_url=review_url,
+            owner=context_session(tool_context).user_id,
+        )
+    except Exception as e:
+        result["notification_error"] = f"Could not queue the reviewer email: {e}"
+    return result
+
+
+def title_slug(report_title: str) -> str:
+    """File name stem for a report title."""
+    return report_title.lower().replace(" ", "_").replace("'", "")
+
 
+def _approved_report_text(review_id: str, tool_context: ToolContext) -> str:
+    """
+    The approved text of a review, from session state or the review service.
+    Only the review this session's report was approved in can be loaded, not
+    any review ID the model passes.
+    """
+    approved = tool_context.state.get(settings.APPROVED_REPORT_KEY) or {}
+    if approved.get("review_id") != review_id:
+        raise ValueError(f"Review {review_id} is not this session's approved report.")
+    if approved.get("outline"):
+        return approved["outline"]
+    review = get_review_client().get_status(review_id)
+    if review.get("status") != "approved" or not review.get("outline"):
+        raise ValueError(f"Review {review_id} has no approved report.")
+    return review["outline"]
 
+
+@traced()
 def save_report_formats(
-    report_markdown: str, report_title: str, tool_context: ToolContext
+    report_title: str,
+    tool_context: ToolContext,
+    report_markdown: Optional[str] = None,
+    review_id: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """
+    Saves the report as Markdown, PDF and DOCX. Pass either the report text as
+    `report_markdown`, or the `review_id` of this session's approved review.
+    """
     creds = get_authenticated_credentials(tool_context, initiate_auth_flow=False)
     if not creds:
         return {
             "status": "failed_auth",
             "message": "Authentication is missing. The `authenticate_google_services` tool MUST be called successfully before using this tool.",
         }
-    try:
-        script_dir = Path(__file__).parent.resolve()
-        font_path = script_dir / "OpenSans.ttf"
-        work_dir = Path("./temp_reports")
-        work_dir.mkdir(exist_ok=True)
-        title_slug = report_title.lower().replace(" ", "_").replace("'", "")
-        md_path = work_dir / f"{title_slug}.md"
-        pdf_path = work_dir / f"{title_slug}.pdf"
-        docx_path = work_dir / f"{title_slug}.docx"
-        md_path.write_text(report_markdown, encoding="utf-8")
-        pdf = FPDF()
-        pdf.add_font("CustomFont", "", str(font_path), uni=True)
-        pdf.set_font("CustomFont", "", 12)
-        pdf.add_page()
-        pdf.multi_cell(0, 10, report_markdown)
-        pdf.output(pdf_path)
-        doc = Document()
-        doc.add_heading(report_title, 0)
-        doc.add_paragraph(report_markdown)
-        doc.save(docx_path)
-        clean_bucket_name = settings.STAGING_BUCKET.replace("gs://", "")
-        gcs_client = storage.Client(credentials=creds)
-        bucket = gcs_client.bucket(clean_bucket_name)
-        drive_service = build("drive", "v3", credentials=creds)
-        gcs_links, drive_links = {}, {}
-
-        for file_path in [md_path, pdf_path, docx_path]:
-            blob = bucket.blob(f"reports/{file_path.name}")
-            blob.upload_from_filename(str(file_path))
-            gcs_links[file_path.suffix] = blob.public_url
-            file_metadata = {"name": file_path.name}
-            media = MediaFileUpload(
-                str(file_path), mimetype="application/octet-stream", resumable=True
-            )
-            file = (
-                drive_service.files()
-                .create(body=file_metadata, media_body=media, fields="webViewLink")
-                .execute()
+    report_text = None
+    if review_id:
+        try:
+            report_markdown = report_text = _approved_report_text(
+                review_id, tool_context
             )
-            drive_links[file_path.suffix] = file.get("webViewLink")
-        return {"status": "success", "gcs_urls": gcs_links, "drive_urls": drive_links}
+        except Exception as e:
+            return {"status": "error", "message": f"Could not load the report: {e}"}
+    if not report_markdown:
+        return {
+            "status": "error",
+            "message": "Pass either `report_markdown` or the `review_id` of an approved review.",
+        }
+    # Deferred: fpdf, python-docx and the storage/Drive clients load on first save.
+    from .reports import save_reports
+
+    try:
+        gcs_links, drive_links, errors = save_reports(
+            report_markdown,
+            report_title,
+            title_slug(report_title),
+            creds,
+            owner=context_session(tool_context).user_id,
+        )
     except Exception as e:
         return {
             "status": "error",
             "message": f"Failed to save report formats: {str(e)}",
         }
+    result = {"status": "success", "gcs_urls": gcs_links, "drive_urls": drive_links}
+    if report_text is not None:
+        # The model never saw the approved text; it needs it for final delivery.
+        result["report_text"] = report_text
+    if errors:
+        # Keep whatever did upload so the user still gets those links.
+        result["status"] = "partial_success" if gcs_links or drive_links else "error"
+        result["errors"] = errors
+    return result
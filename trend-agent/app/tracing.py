@@ -0,0 +1,120 @@
+import contextvars
+import functools
+import inspect
+import os
+from concurrent.futures import Executor, Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import propagate, trace
+
+from .config import settings
+
+# Spans go to whatever tracer provider is installed: the one from
+# `configure_tracing`, or the host's (ADK web, Agent Engine). Without either,
+# the API's no-op provider makes every span free.
+tracer = trace.get_tracer("trend-agent")
+
+
+@lru_cache(maxsize=None)
+def configure_tracing() -> None:
+    """
+    Installs the span exporter selected by `TRACE_EXPORTER` once per process:
+    `console` prints spans to stdout, `file` appends one JSON span per line to
+    `TRACE_FILE_PATH`. If the host already set up an SDK tracer provider, the
+    exporter is added to it so ADK's own spans land in the same traces.
+    """
+    exporter_name = (settings.TRACE_EXPORTER or "").lower()
+    if not exporter_name:
+        return
+    # Imported here so the SDK stays off the import path when tracing is off.
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(settings.TRACE_FILE_PATH, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {settings.TRACE_EXPORTER}")
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.AGENT_NAME})
+        )
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+
+
+def _annotate(span: trace.Span, args: tuple, kwargs: Dict[str, Any]) -> None:
+    """
+    Tags tool and callback spans with the ADK invocation they ran in, read
+    from the public `invocation_id` of their tool or callback context.
+    """
+    # ADK is loaded by the time a tool or callback runs.
+    from google.adk.agents.readonly_context import ReadonlyContext
+
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, ReadonlyContext):
+            span.set_attribute("adk.invocation_id", value.invocation_id)
+            return
+
+
+def _record_result(span: trace.Span, result: Any) -> None:
+    if isinstance(result, dict) and "status" in result:
+        span.set_attribute("result.status", str(result["status"]))
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Runs the decorated function (sync or async) in a span, named
+    `<module>.<function>` by default. The signature is preserved, so ADK still
+    builds the same tool declaration and injects `tool_context`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name) as span:
+                    _annotate(span, args, kwargs)
+                    result = await func(*args, **kwargs)
+                    _record_result(span, result)
+                    return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name) as span:
+                _annotate(span, args, kwargs)
+                result = func(*args, **kwargs)
+                _record_result(span, result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def submit(executor: Executor, func: Callable, *args) -> Future:
+    """
+    `executor.submit` that carries over the current trace context, so spans
+    started on worker threads join the caller's trace.
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Adds W3C `traceparent` headers for the current span to `headers`."""
+    headers = dict(headers or {})
+    propagate.inject(headers)
+    return headers
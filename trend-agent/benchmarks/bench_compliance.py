@@ -0,0 +1,94 @@
+"""
+Benchmarks the competitor scanner used by `check_report_for_verification`
+against the previous per-competitor substring loop.
+
+Run from the `trend-agent` folder:
+    python benchmarks/bench_compliance.py --competitors 20000 --report-kb 50 200
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+# The scanner only needs settings to exist; placeholders keep this runnable offline.
+for required in (
+    "GOOGLE_CLOUD_PROJECT",
+    "GOOGLE_CLOUD_LOCATION",
+    "STAGING_BUCKET",
+    "REVIEW_APP_BASE_URL",
+    "REVIEWER_EMAIL",
+    "OAUTH_CLIENT_ID",
+    "OAUTH_CLIENT_SECRET",
+    "AUTH_ID",
+    "AGENT_NAME",
+):
+    os.environ.setdefault(required, "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.compliance import CompetitorMatcher  # noqa: E402
+
+
+def random_word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def make_report(rng: random.Random, size_bytes: int, names: list) -> str:
+    words = []
+    total = 0
+    while total < size_bytes:
+        if rng.random() < 0.001:
+            word = rng.choice(names)
+        else:
+            word = random_word(rng, rng.randint(2, 10))
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words)
+
+
+def naive_scan(text: str, competitors: list) -> list:
+    return [c for c in competitors if c in text.lower()]
+
+
+def timed(func, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--competitors", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--report-kb", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--skip-naive", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    header = ("competitors", "report_kb", "build_s", "scan_s", "naive_s", "matches")
+    print(" ".join(f"{column:>12}" for column in header))
+    for count in args.competitors:
+        names = [f"{random_word(rng, 6)} {random_word(rng, 5)}" for _ in range(count)]
+        started = time.perf_counter()
+        matcher = CompetitorMatcher({name: name for name in names})
+        build_seconds = time.perf_counter() - started
+        for report_kb in args.report_kb:
+            report = make_report(rng, report_kb * 1024, names)
+            scan_seconds = timed(matcher.scan, report)
+            naive_seconds = float("nan")
+            if not args.skip_naive:
+                naive_seconds = timed(naive_scan, report, names, repeat=1)
+            row = (build_seconds, scan_seconds, naive_seconds)
+            print(
+                f"{count:>12} {report_kb:>12} "
+                + " ".join(f"{value:>12.4f}" for value in row)
+                + f" {len(matcher.scan(report)):>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,623 @@
+"""
+Offline end-to-end benchmark of the report workflow: authenticate, classify,
+research, check, submit, poll, approve and save, for 1, 10 and 100 concurrent
+sessions.
+
+Everything outside this repo is replaced by a local stand-in:
+- Gemini: a scripted model that plays both the root and the research agent,
+  with a fixed latency per call.
+- The review app: served on localhost by uvicorn with the `memory` backend.
+- GCS, Drive and Gmail: fakes with a fixed latency per API call.
+
+Each session runs through ADK's `InMemoryRunner` exactly as in production:
+one turn asks for a report, a simulated reviewer approves it over HTTP, and a
+second turn saves it. Stage timings come from the OpenTelemetry spans the app
+already emits, collected in memory. A second pass per concurrency level runs
+with `tracemalloc` on, and reports the memory each stage leaves allocated
+(net of frees) and the peak. At more than one session, stages overlap, so
+those figures include concurrent work.
+
+Run from the `trend-agent` folder (point --font at any TrueType font if the
+bundled one is missing):
+    python benchmarks/bench_e2e.py --sessions 1 10 100 --font /path/to/font.ttf
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import re
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+# Placeholders so settings load offline; the review app URL is set below.
+for required in (
+    "GOOGLE_CLOUD_PROJECT",
+    "GOOGLE_CLOUD_LOCATION",
+    "STAGING_BUCKET",
+    "REVIEWER_EMAIL",
+    "OAUTH_CLIENT_ID",
+    "OAUTH_CLIENT_SECRET",
+    "AUTH_ID",
+    "AGENT_NAME",
+):
+    os.environ.setdefault(required, "benchmark")
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REVIEW_APP_DIR = os.path.join(os.path.dirname(AGENT_DIR), "trend-review-app")
+
+def stages(research_tool: str, delivery: str) -> List[Tuple[str, str]]:
+    """
+    (stage, span name) in workflow order. Spans come from app.tracing, ADK and
+    the review app's request middleware.
+    """
+    return [
+        ("auth", "auth_tool.authenticate_google_services"),
+        ("classify", "tools.classify_topic"),
+        ("research", f"execute_tool {research_tool}"),
+        ("check", "tools.check_report_for_verification"),
+        ("submit", "tools.submit_report_for_verification"),
+        ("poll", "callbacks.check_review_status"),
+        ("approve", "POST /reviews/{review_id}/decide"),
+        (
+            "save",
+            "delivery.save_reports"
+            if delivery == "stream"
+            else "tools.save_report_formats",
+        ),
+        ("shown", "bench.report_shown"),
+        ("llm", "call_llm"),
+        ("session", "bench.session"),
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# -- span collection ---------------------------------------------------------
+
+
+def install_span_recorder():
+    """Installs an SDK tracer provider that keeps finished spans in memory."""
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+
+    class StageRecorder(SpanProcessor):
+        """Durations per span name, and traced-memory deltas when enabled."""
+
+        def __init__(self):
+            self.durations: Dict[str, List[float]] = defaultdict(list)
+            self.allocations: Dict[str, List[int]] = defaultdict(list)
+            self._memory_at_start: Dict[int, int] = {}
+            self._lock = threading.Lock()
+
+        def reset(self) -> None:
+            with self._lock:
+                self.durations.clear()
+                self.allocations.clear()
+                self._memory_at_start.clear()
+
+        def on_start(self, span, parent_context=None) -> None:
+            if tracemalloc.is_tracing():
+                with self._lock:
+                    self._memory_at_start[span.context.span_id] = (
+                        tracemalloc.get_traced_memory()[0]
+                    )
+
+        def on_end(self, span) -> None:
+            with self._lock:
+                duration = (span.end_time - span.start_time) / 1e9
+                self.durations[span.name].append(duration)
+                started = self._memory_at_start.pop(span.context.span_id, None)
+                if started is not None:
+                    self.allocations[span.name].append(
+                        tracemalloc.get_traced_memory()[0] - started
+                    )
+
+    recorder = StageRecorder()
+    provider = TracerProvider()
+    provider.add_span_processor(recorder)
+    trace.set_tracer_provider(provider)
+    return recorder
+
+
+# -- Google API fakes --------------------------------------------------------
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self._bucket = bucket
+        self.name = name
+        self.metadata: Optional[Dict[str, str]] = None
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/bench/{self.name}"
+
+    def upload_from_file(self, stream, size=None, content_type=None) -> None:
+        stream.read()
+        time.sleep(self._bucket.latency)
+        self._bucket.objects[self.name] = dict(self.metadata or {})
+
+    def patch(self) -> None:
+        time.sleep(self._bucket.latency)
+        self._bucket.objects.setdefault(self.name, {}).update(self.metadata or {})
+
+
+class FakeBucket:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.objects: Dict[str, Dict[str, str]] = {}
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[FakeBlob]:
+        time.sleep(self.latency)
+        if name not in self.objects:
+            return None
+        blob = FakeBlob(self, name)
+        blob.metadata = dict(self.objects[name])
+        return blob
+
+
+class FakeStorageClient:
+    def __init__(self, latency: float):
+        self._bucket = FakeBucket(latency)
+
+    def bucket(self, name: str) -> FakeBucket:
+        return self._bucket
+
+
+class FakeRequest:
+    def __init__(self, latency: float, result: Dict[str, Any], media=None):
+        self._latency = latency
+        self._result = result
+        self._media = media
+
+    def execute(self, http=None) -> Dict[str, Any]:
+        if self._media is not None:
+            self._media.getbytes(0, self._media.size())
+        time.sleep(self._latency)
+        return self._result
+
+
+class FakeBatch:
+    def __init__(self, latency: float, callback):
+        self._latency = latency
+        self._callback = callback
+        self._requests: List[str] = []
+
+    def add(self, request: FakeRequest, request_id: str) -> None:
+        self._requests.append(request_id)
+
+    def execute(self, http=None) -> None:
+        time.sleep(self._latency)
+        for request_id in self._requests:
+            self._callback(request_id, {"id": request_id}, None)
+
+
+class FakeService:
+    """Just enough of the Drive v3 and Gmail v1 discovery clients."""
+
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    def files(self) -> "FakeService":
+        return self
+
+    def users(self) -> "FakeService":
+        return self
+
+    def messages(self) -> "FakeService":
+        return self
+
+    def create(self, body, media_body=None, fields=None) -> FakeRequest:
+        link = f"https://drive.google.com/file/d/{body['name']}/view"
+        return FakeRequest(self._latency, {"webViewLink": link}, media_body)
+
+    def send(self, userId, body) -> FakeRequest:
+        return FakeRequest(self._latency, {"id": "message"})
+
+    def new_batch_http_request(self, callback) -> FakeBatch:
+        return FakeBatch(self._latency, callback)
+
+
+def install_google_fakes(latency: float) -> None:
+    from app import google_clients, reports
+
+    storage_client = FakeStorageClient(latency)
+    service = FakeService(latency)
+    for module in (google_clients, reports):
+        module.get_storage_client = lambda creds: storage_client
+        module.get_service = lambda api, version, creds: service
+        module.authorized_http = lambda creds: None
+
+
+# -- scripted model ----------------------------------------------------------
+
+
+def make_scripted_llm(latency: float, report_paragraphs: int):
+    from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+    from google.genai import types
+
+    from app.research import research_tool_name
+    from app.research_cache import get_research_cache
+
+    research_tool = research_tool_name()
+
+    def call(name: str, **args) -> types.Part:
+        return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+    def text(value: str) -> types.Part:
+        return types.Part(text=value)
+
+    class ScriptedLlm(BaseLlm):
+        """
+        Plays the root agent's workflow (and the research agent's answer) by
+        looking at the last message, so no network or model is involved.
+        """
+
+        model: str = "gemini-2.5-flash"
+
+        async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+        ) -> AsyncGenerator[LlmResponse, None]:
+            await asyncio.sleep(latency)
+            yield LlmResponse(
+                content=types.Content(role="model", parts=[self._next(llm_request)])
+            )
+
+        def _next(self, llm_request: LlmRequest) -> types.Part:
+            contents = llm_request.contents
+            first_text = next(
+                (p.text for c in contents for p in c.parts or [] if p.text), ""
+            )
+            if "research assistant" in str(llm_request.config.system_instruction):
+                # Half of each answer repeats across queries, as overlapping
+                # searches do, so fan-out's merge has duplicates to drop.
+                return text(
+                    "\n\n".join(
+                        f"Finding {i}: demand keeps growing while comp1 expands "
+                        f"its share in the premium segment. Sources on "
+                        f"{first_text} confirm trend {i} for this quarter."
+                        for i in range(report_paragraphs)
+                    )
+                )
+
+            topic = first_text.rsplit(" on ", 1)[-1]
+            last = contents[-1].parts[-1]
+            if last.function_response is not None:
+                name = last.function_response.name
+                response = last.function_response.response or {}
+                if name == "authenticate_google_services":
+                    return call("classify_topic", topic=topic)
+                if name == "classify_topic" and research_tool == "research_topic":
+                    angles = ("market size", "consumer trends", "competitors")
+                    queries = [f"{topic} {angle}" for angle in angles]
+                    return call("research_topic", queries=queries)
+                if name == "classify_topic":
+                    return call("research_agent", request=f"latest trends in {topic}")
+                if name in ("research_topic", "research_agent"):
+                    findings = str(response.get("findings", response.get("result")))
+                    report = f"# {topic.title()} Market Report\n\n{findings}"
+                    return call("check_report_for_verification", report_text=report)
+                if name == "check_report_for_verification":
+                    return call("submit_report_for_verification")
+                if name == "submit_report_for_verification":
+                    return text("The report has been sent for review.")
+                # After save_report_formats: the report, then its links.
+                return text(f"{response.get('report_text', '')}\n\n{response}")
+
+            approved = re.search(r"`review_id` set to '([^']+)'", last.text or "")
+            if approved:
+                return call(
+                    "save_report_formats",
+                    report_title=f"{topic.title()} Report",
+                    review_id=approved.group(1),
+                )
+            inline = re.search(r"---\n(.*)\n---", last.text or "", re.DOTALL)
+            if inline:
+                return call(
+                    "save_report_formats",
+                    report_title=f"{topic.title()} Report",
+                    report_markdown=inline.group(1),
+                )
+            return call("authenticate_google_services")
+
+    return ScriptedLlm()
+
+
+# -- review app --------------------------------------------------------------
+
+
+def start_review_app(port: int):
+    """Serves the review app (memory backend) on a background thread."""
+    import uvicorn
+
+    os.environ["REVIEW_STORAGE_BACKEND"] = "memory"
+    cwd = os.getcwd()
+    os.chdir(REVIEW_APP_DIR)  # main mounts templates and static by relative path
+    sys.path.insert(0, REVIEW_APP_DIR)
+    try:
+        import main as review_app
+    finally:
+        sys.path.remove(REVIEW_APP_DIR)
+        os.chdir(cwd)
+
+    server = uvicorn.Server(
+        uvicorn.Config(review_app.app, port=port, log_level="warning", lifespan="off")
+    )
+    threading.Thread(target=server.run, name="review-app", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+# -- workflow ----------------------------------------------------------------
+
+
+async def approve(reviewer, review_id: str, delay: float) -> int:
+    """
+    The reviewer opens the review and approves it unchanged. Returns the time
+    of the decision, in nanoseconds since the epoch.
+    """
+    await asyncio.sleep(delay)
+    review = await reviewer.get(f"/reviews/{review_id}/status", params={"full": "true"})
+    review.raise_for_status()
+    decision = await reviewer.post(
+        f"/reviews/{review_id}/decide",
+        data={
+            "decision": "approved",
+            "outline": review.json()["outline"],
+            "comment": "Looks good.",
+        },
+    )
+    decision.raise_for_status()
+    return time.time_ns()
+
+
+async def run_session(
+    runner, reviewer, index: int, topic: str, review_delay: float
+) -> None:
+    """
+    One user asks for a report on `topic`. The reviewer approves it while the
+    agent waits on the review, so submit, poll and save happen in one turn.
+    Succeeds once the report is saved, by the tool or by streamed delivery.
+    """
+    from google.genai import types
+
+    from app.auth_tool import GOOGLE_TOKENS_KEY
+    from app.config import settings
+    from app.delivery import DELIVERED_MESSAGE
+    from app.tracing import tracer
+
+    user_id = f"user-{index}"
+    tokens = {
+        "token": f"token-{index}",
+        "refresh_token": f"refresh-{index}",
+        "client_id": "benchmark",
+        "client_secret": "benchmark",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "expiry": "2999-01-01T00:00:00Z",
+    }
+    session = await runner.session_service.create_session(
+        app_name=runner.app_name, user_id=user_id, state={GOOGLE_TOKENS_KEY: tokens}
+    )
+    message = types.Content(
+        role="user",
+        parts=[types.Part(text=f"Create a market report on {topic}")],
+    )
+    heading = f"# {topic.title()} Market Report"
+    approval = None
+    shown = False
+    saved = None
+    with tracer.start_as_current_span("bench.session"):
+        async for event in runner.run_async(
+            user_id=user_id, session_id=session.id, new_message=message
+        ):
+            # The submit tool's result is replaced by a canned message, so the
+            # review ID is taken from the state change it makes.
+            review_id = event.actions.state_delta.get(settings.REPORT_REVIEW_ID_KEY)
+            if review_id and approval is None:
+                approval = asyncio.create_task(
+                    approve(reviewer, review_id, review_delay)
+                )
+            for response in event.get_function_responses():
+                if response.name == "save_report_formats":
+                    saved = response.response
+            parts = event.content.parts if event.content else None
+            message_text = "".join(part.text or "" for part in parts or [])
+            if heading in message_text and approval is not None and not shown:
+                # From the reviewer's decision to the report reaching the user.
+                shown = True
+                tracer.start_span(
+                    "bench.report_shown", start_time=await approval
+                ).end()
+            if message_text == DELIVERED_MESSAGE:
+                saved = {"status": "success"}
+        if approval is None:
+            raise RuntimeError(f"Session {index} did not submit a report for review.")
+        await approval
+    if not saved or saved.get("status") != "success":
+        raise RuntimeError(f"Session {index} did not save its report: {saved}")
+
+
+async def run_level(
+    runner, base_url: str, sessions: int, topics: int, review_delay: float
+) -> float:
+    """Runs `sessions` sessions at once, over `topics` distinct topics (0: all)."""
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as reviewer:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                run_session(
+                    runner,
+                    reviewer,
+                    index,
+                    f"electric bikes {index % topics if topics else index}",
+                    review_delay,
+                )
+                for index in range(sessions)
+            )
+        )
+        return time.perf_counter() - started
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+def report(
+    stage_spans: List[Tuple[str, str]],
+    sessions: int,
+    wall: float,
+    durations: Dict[str, List[float]],
+    allocations: Dict[str, List[int]],
+    peak: int,
+) -> None:
+    print(
+        f"\n{sessions} concurrent session(s): {wall:.2f}s wall, "
+        f"{sessions / wall:.1f} sessions/s, traced peak {peak / 2**20:.1f} MiB"
+    )
+    print(
+        f"{'stage':>9} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+        f"{'calls/s':>8} {'net KiB/call':>13}"
+    )
+    for stage, span_name in stage_spans:
+        samples = durations.get(span_name)
+        if not samples:
+            print(f"{stage:>9} {'-':>6}")
+            continue
+        allocated = allocations.get(span_name)
+        net = (
+            f"{statistics.mean(allocated) / 1024:13.1f}" if allocated else f"{'-':>13}"
+        )
+        print(
+            f"{stage:>9} {len(samples):6d} {percentile(samples, 0.5) * 1e3:8.1f} "
+            f"{percentile(samples, 0.95) * 1e3:8.1f} {max(samples) * 1e3:8.1f} "
+            f"{len(samples) / wall:8.1f} {net}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0)
+    parser.add_argument("--api-latency-ms", type=float, default=10.0)
+    parser.add_argument(
+        "--report-paragraphs", type=int, default=20, help="research answer length"
+    )
+    parser.add_argument(
+        "--review-delay-ms",
+        type=float,
+        default=50.0,
+        help="time from submission to the reviewer's approval",
+    )
+    parser.add_argument(
+        "--topics",
+        type=int,
+        default=0,
+        help="distinct topics across sessions, so the research cache gets hits "
+        "(0: every session has its own topic)",
+    )
+    parser.add_argument("--font", type=Path, help="TrueType font for PDF rendering")
+    parser.add_argument(
+        "--skip-allocations", action="store_true", help="skip the tracemalloc pass"
+    )
+    args = parser.parse_args()
+
+    port = free_port()
+    os.environ["REVIEW_APP_BASE_URL"] = f"http://127.0.0.1:{port}"
+    work_dir = tempfile.mkdtemp(prefix="bench-e2e-")
+    os.environ["NOTIFICATION_OUTBOX_PATH"] = os.path.join(work_dir, "outbox.sqlite3")
+    os.environ["RESEARCH_CACHE_PATH"] = os.path.join(work_dir, "research.sqlite3")
+    os.environ.pop("TRACE_EXPORTER", None)
+    recorder = install_span_recorder()
+    sys.path.insert(0, AGENT_DIR)
+
+    from google.adk.runners import InMemoryRunner
+
+    from app import reports
+    from app.agent import analyst_agent, root_agent
+    from app.config import settings
+    from app.research import research_tool_name
+    from app.research_cache import get_research_cache
+    from app.subagents import research_agent
+
+    reports.FONT_PATH = args.font or reports.FONT_PATH
+    if not reports.FONT_PATH.exists():
+        sys.exit(f"Font not found: {reports.FONT_PATH}. Pass --font /path/to/font.ttf")
+    install_google_fakes(args.api_latency_ms / 1000)
+    model = make_scripted_llm(args.llm_latency_ms / 1000, args.report_paragraphs)
+    analyst_agent.model = model
+    research_agent.model = model
+    start_review_app(port)
+    runner = InMemoryRunner(agent=root_agent, app_name="bench")
+    base_url = os.environ["REVIEW_APP_BASE_URL"]
+    review_delay = args.review_delay_ms / 1000
+    stage_spans = stages(research_tool_name(), settings.APPROVED_REPORT_DELIVERY)
+
+    print(
+        f"LLM latency {args.llm_latency_ms}ms per call, "
+        f"Google API latency {args.api_latency_ms}ms per call, "
+        f"review service pool {settings.REVIEW_SERVICE_POOL_SIZE} connections, "
+        f"research cache {settings.RESEARCH_CACHE_BACKEND}, "
+        f"{settings.APPROVED_REPORT_DELIVERY} delivery"
+    )
+    cache = get_research_cache()
+    # Per-call ADK warnings and the auth tool's prints would drown the tables.
+    logging.getLogger("google_adk").setLevel(logging.ERROR)
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    for sessions in args.sessions:
+        recorder.reset()
+        if cache is not None:
+            cache.clear()  # each pass starts cold
+        with quiet:
+            wall = asyncio.run(
+                run_level(runner, base_url, sessions, args.topics, review_delay)
+            )
+        cache_stats = cache.stats() if cache is not None else None
+        durations = {
+            name: list(samples) for name, samples in recorder.durations.items()
+        }
+        allocations: Dict[str, List[int]] = {}
+        peak = 0
+        if not args.skip_allocations:
+            recorder.reset()
+            if cache is not None:
+                cache.clear()
+            tracemalloc.start()
+            with quiet:
+                asyncio.run(
+                    run_level(runner, base_url, sessions, args.topics, review_delay)
+                )
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            allocations = dict(recorder.allocations)
+        report(stage_spans, sessions, wall, durations, allocations, peak)
+        if cache_stats is not None:
+            print(
+                f"research cache: {cache_stats['hits']} hits, "
+                f"{cache_stats['misses']} misses"
+            )
+
+
+if __name__ == "__main__":
+    main()
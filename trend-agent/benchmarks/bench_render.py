@@ -0,0 +1,130 @@
+"""
+Benchmarks PDF and DOCX rendering of long reports: the block-based
+renderers used by `save_report_formats` against the previous approach (one
+`multi_cell` / one paragraph holding the raw markdown).
+
+Run from the `trend-agent` folder (OpenSans.ttf is not checked in; point
+--font at any TrueType font if it is missing):
+    python benchmarks/bench_render.py --pages 10 100 500 --font /path/to/font.ttf
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+# The renderers only need settings to exist; placeholders keep this runnable offline.
+for required in (
+    "GOOGLE_CLOUD_PROJECT",
+    "GOOGLE_CLOUD_LOCATION",
+    "STAGING_BUCKET",
+    "REVIEW_APP_BASE_URL",
+    "REVIEWER_EMAIL",
+    "OAUTH_CLIENT_ID",
+    "OAUTH_CLIENT_SECRET",
+    "AUTH_ID",
+    "AGENT_NAME",
+):
+    os.environ.setdefault(required, "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from fpdf import FPDF  # noqa: E402
+
+from app.markdown_blocks import parse_markdown  # noqa: E402
+from app.renderers import render_docx, render_pdf  # noqa: E402
+from app.reports import FONT_PATH  # noqa: E402
+
+WORDS = (
+    "market growth demand supply pricing consumer segment revenue share "
+    "adoption forecast battery charging network regulation premium volume "
+    "region retail channel margin investment capacity"
+).split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    words[rng.randrange(len(words))] = f"**{rng.choice(WORDS)}**"
+    return " ".join(words).capitalize() + "."
+
+
+def make_report(rng: random.Random, pages: int) -> str:
+    """Roughly one rendered PDF page per section."""
+    sections = [f"# Market Report ({pages} pages)"]
+    for number in range(pages):
+        sections.append(f"## Section {number + 1}")
+        for _ in range(3):
+            sections.append(" ".join(sentence(rng) for _ in range(4)))
+        sections.append("\n".join(f"- {sentence(rng)}" for _ in range(4)))
+        rows = "\n".join(
+            f"| {rng.choice(WORDS)} | {rng.randint(1, 99)}% | {sentence(rng)} |"
+            for _ in range(4)
+        )
+        sections.append(f"| Segment | Share | Note |\n|---|---|---|\n{rows}")
+    return "\n\n".join(sections)
+
+
+def legacy_pdf(report_markdown: str, font: Path) -> bytes:
+    pdf = FPDF()
+    pdf.add_font("CustomFont", "", str(font))
+    pdf.set_font("CustomFont", "", 12)
+    pdf.add_page()
+    pdf.multi_cell(0, 10, report_markdown)
+    return bytes(pdf.output())
+
+
+def legacy_docx(report_markdown: str, title: str) -> bytes:
+    doc = Document()
+    doc.add_heading(title, 0)
+    doc.add_paragraph(report_markdown)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--font", type=Path, default=FONT_PATH)
+    parser.add_argument(
+        "--skip-legacy", action="store_true", help="Only time the new renderers."
+    )
+    args = parser.parse_args()
+    if not args.font.exists():
+        sys.exit(f"Font not found: {args.font}. Pass --font /path/to/font.ttf")
+
+    rng = random.Random(0)
+    print(
+        f"{'pages':>6} {'KB md':>7} {'parse s':>8} {'pdf s':>7} {'pdf pages':>9}"
+        f" {'docx s':>7} {'legacy pdf s':>12} {'legacy docx s':>13}"
+    )
+    for pages in args.pages:
+        report = make_report(rng, pages)
+        parse_s, blocks = timed(parse_markdown, report)
+        pdf_s, pdf_bytes = timed(render_pdf, blocks, args.font)
+        docx_s, _ = timed(render_docx, blocks, "Market Report")
+        rendered_pages = pdf_bytes.count(b"/Type /Page\n") or pdf_bytes.count(
+            b"/Type /Page"
+        ) - 1
+        legacy = ("-", "-")
+        if not args.skip_legacy:
+            legacy_pdf_s, _ = timed(legacy_pdf, report, args.font)
+            legacy_docx_s, _ = timed(legacy_docx, report, "Market Report")
+            legacy = (f"{legacy_pdf_s:.2f}", f"{legacy_docx_s:.2f}")
+        print(
+            f"{pages:>6} {len(report) / 1024:>7.0f} {parse_s:>8.3f} {pdf_s:>7.2f}"
+            f" {rendered_pages:>9} {docx_s:>7.2f} {legacy[0]:>12} {legacy[1]:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
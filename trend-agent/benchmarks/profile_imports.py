@@ -0,0 +1,109 @@
+"""
+Summarizes `python -X importtime` for the agent package, to catch import-time
+regressions that slow Agent Engine cold starts and the pickle round trip in
+`local_test.py`.
+
+Run from the `trend-agent` folder:
+    python benchmarks/profile_imports.py --module app.agent --top 25
+    python benchmarks/profile_imports.py --budget-ms 3000  # exit 1 if slower
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports that should only load on first use; reported if they show up.
+DEFERRED_MODULES = (
+    "fpdf",
+    "docx",
+    "vertexai",
+    "google.cloud.storage",
+    "googleapiclient.discovery",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile(module: str) -> List[ImportTiming]:
+    env = dict(os.environ)
+    # Settings are only read on first use, but keep the run independent of .env.
+    for required in (
+        "GOOGLE_CLOUD_PROJECT",
+        "GOOGLE_CLOUD_LOCATION",
+        "STAGING_BUCKET",
+        "REVIEW_APP_BASE_URL",
+        "REVIEWER_EMAIL",
+        "OAUTH_CLIENT_ID",
+        "OAUTH_CLIENT_SECRET",
+        "AUTH_ID",
+        "AGENT_NAME",
+    ):
+        env.setdefault(required, "benchmark")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append(
+                ImportTiming(name, int(self_us), int(cumulative_us), len(indent) // 2)
+            )
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="app.agent")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Exit non-zero if the total import time exceeds this.",
+    )
+    args = parser.parse_args()
+
+    timings = profile(args.module)
+    target = next(t for t in reversed(timings) if t.module == args.module)
+    total_ms = target.cumulative_us / 1000
+    print(f"{args.module}: {total_ms:.0f} ms cumulative, {len(timings)} modules\n")
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    # Top-level entries only: nested imports are already in their parent's total.
+    top_level = [t for t in timings if t.depth <= 1]
+    for t in sorted(top_level, key=lambda t: t.cumulative_us, reverse=True)[
+        : args.top
+    ]:
+        print(f"{t.cumulative_us / 1000:14.1f} {t.self_us / 1000:9.1f}  {t.module}")
+
+    loaded = {t.module for t in timings}
+    eager = [name for name in DEFERRED_MODULES if name in loaded]
+    if eager:
+        print(f"\n⚠️ Imported eagerly (expected to load on first use): {eager}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        sys.exit(f"\n❌ {total_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
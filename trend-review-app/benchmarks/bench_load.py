@@ -0,0 +1,175 @@
+"""
+Load benchmark for the review app against an in-memory Firestore stand-in
+and the local (memory, SQLite) storage backends.
+
+The stand-in adds a fixed latency to every Firestore call. In `blocking` mode
+that latency is spent in `time.sleep` (what the synchronous `firestore.Client`
+did to the event loop); in `async` mode it is awaited, as with
+`firestore.AsyncClient`. Comparing both shows the requests/second the
+handlers gain by not blocking uvicorn's loop.
+
+Run from the `trend-review-app` folder:
+    python benchmarks/bench_load.py --requests 2000 --concurrency 50 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+from google.cloud import firestore
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Snapshot:
+    def __init__(self, reference: "_DocumentRef", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class _DocumentRef:
+    def __init__(self, client: "FakeAsyncClient", collection: str, doc_id: str):
+        self._client = client
+        self._docs = client.collections.setdefault(collection, {})
+        self.id = doc_id
+
+    @staticmethod
+    def _resolve(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: (time.time() if value is firestore.SERVER_TIMESTAMP else value)
+            for key, value in data.items()
+        }
+
+    async def get(self) -> _Snapshot:
+        await self._client.round_trip()
+        return _Snapshot(self, self._docs.get(self.id))
+
+    async def set(self, data: Dict[str, Any]) -> None:
+        await self._client.round_trip()
+        self._docs[self.id] = self._resolve(data)
+
+    async def update(self, data: Dict[str, Any]) -> None:
+        await self._client.round_trip()
+        self._docs[self.id].update(self._resolve(data))
+
+    async def delete(self) -> None:
+        await self._client.round_trip()
+        self._docs.pop(self.id, None)
+
+
+class _CollectionRef:
+    def __init__(self, client: "FakeAsyncClient", name: str):
+        self._client = client
+        self._name = name
+
+    def document(self, doc_id: Optional[str] = None) -> _DocumentRef:
+        return _DocumentRef(self._client, self._name, doc_id or uuid.uuid4().hex)
+
+    async def stream(self):
+        await self._client.round_trip()
+        for doc_id in list(self._client.collections.get(self._name, {})):
+            ref = self.document(doc_id)
+            yield _Snapshot(ref, ref._docs.get(doc_id))
+
+
+class FakeAsyncClient:
+    """In-memory stand-in for `firestore.AsyncClient` with simulated latency."""
+
+    latency = 0.005
+    blocking = False
+
+    def __init__(self, *args, **kwargs):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    async def round_trip(self) -> None:
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+    def collection(self, name: str) -> _CollectionRef:
+        return _CollectionRef(self, name)
+
+
+def load_app(latency: float, blocking: bool, backend: str = "firestore"):
+    FakeAsyncClient.latency = latency
+    FakeAsyncClient.blocking = blocking
+    firestore.AsyncClient = FakeAsyncClient
+    os.environ["REVIEW_STORAGE_BACKEND"] = backend
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    sys.modules.pop("main", None)
+    import main
+
+    return main.app
+
+
+async def run(app, total_requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    base_url = "http://bench"
+    async with httpx.AsyncClient(transport=transport, base_url=base_url) as client:
+        review_ids = []
+        for _ in range(concurrency):
+            response = await client.post("/reviews", json={"outline": "x" * 2000})
+            review_ids.append(response.json()["review_id"])
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def poll(review_id: str) -> None:
+            async with semaphore:
+                response = await client.get(f"/reviews/{review_id}/status")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(poll(review_ids[i % len(review_ids)]) for i in range(total_requests))
+        )
+        return total_requests / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Review app load benchmark")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["blocking", "async", "memory", "sqlite"],
+        help="blocking/async use the Firestore stand-in; memory/sqlite the "
+        "local storage backends",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["REVIEW_SQLITE_PATH"] = os.path.join(tmp_dir, "reviews.db")
+        for mode in args.modes:
+            backend = mode if mode in ("memory", "sqlite") else "firestore"
+            app = load_app(
+                args.latency_ms / 1000, blocking=mode == "blocking", backend=backend
+            )
+            rps = asyncio.run(run(app, args.requests, args.concurrency))
+            latency = ""
+            if backend == "firestore":
+                latency = f", {args.latency_ms}ms per Firestore call"
+            print(
+                f"{mode:>9}: {rps:8.1f} req/s ({args.requests} status polls, "
+                f"concurrency {args.concurrency}{latency})"
+            )
+
+
+if __name__ == "__main__":
+    main()
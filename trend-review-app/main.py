@@ -1,26 +1,103 @@
+import asyncio
+import json
+import os
 import uuid
-from fastapi import FastAPI, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+from fastapi import FastAPI, HTTPException, Request, Form, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from google.cloud import firestore
 from pydantic import BaseModel
-from typing import Literal
+from typing import List, Literal, Optional, Tuple
+
+from notifier import ReviewNotifier
+from revisions import (
+    MissingRevisionError,
+    apply_patch,
+    diff_segments,
+    load_chain,
+    make_patch,
+    outline_from_chain,
+    patch_size,
+    text_sha256,
+)
+from routing import ReviewerRouter, parse_pools
+from status_cache import StatusCache, compute_etag
+from storage import SERVER_TIMESTAMP, InvalidCursorError, create_store
+from tracing import configure_tracing, trace_requests
 
 # Initialize FastAPI app
+configure_tracing()
 app = FastAPI(title="Story Draft Review App")
+# Server span per request; set TRACE_EXPORTER to export them.
+app.middleware("http")(trace_requests)
 
 # Mount the 'static' directory to serve files like images
 # This line should be added right after you create the app
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount(
+    "/static", StaticFiles(directory="static", check_dir=False), name="static"
+)
+
+# Review storage, selected with REVIEW_STORAGE_BACKEND (firestore, sqlite or
+# memory). Firestore uses the async client so round trips don't block the loop.
+store = create_store()
+
+# Wakes long-poll and SSE waiters when a decision is recorded on this instance.
+notifier = ReviewNotifier()
 
-# Initialize Firestore client
-# On Cloud Run, this will automatically use the runtime service account.
-db = firestore.Client()
+# Upper bound for a single long-poll, kept below Cloud Run's request timeout.
+MAX_WAIT_SECONDS = 55.0
+# Interval between SSE keep-alive comments so proxies don't drop the stream.
+SSE_KEEPALIVE_SECONDS = 15.0
+# When set, new reviews get an `expire_at` timestamp this many days out. With a
+# Firestore TTL policy on that field, old reviews are removed without any scan.
+REVIEW_RETENTION_DAYS = os.environ.get("REVIEW_RETENTION_DAYS")
+# How long polling endpoints may serve a review from memory instead of storage.
+STATUS_CACHE_TTL_SECONDS = float(os.environ.get("STATUS_CACHE_TTL_SECONDS", "5"))
+
+# Serves repeated status polls without a storage read; decisions invalidate it.
+status_cache = StatusCache(STATUS_CACHE_TTL_SECONDS)
+# Page size bounds for the reviewer dashboard and the review listing API.
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+# Characters of the outline shown per review in listings.
+EXCERPT_CHARS = 160
+# Revisions store a diff against their parent, except every Nth revision in a
+# chain, which stores its full text so rebuilding one reads at most N reviews.
+REVISION_SNAPSHOT_INTERVAL = int(os.environ.get("REVISION_SNAPSHOT_INTERVAL", "10"))
+# Tenant of reviews submitted without one.
+DEFAULT_TENANT = os.environ.get("DEFAULT_TENANT", "default")
+# Reviewers new reviews are assigned to: comma-separated emails, or a JSON
+# object of tenant -> emails. Without a pool, reviews stay unassigned.
+reviewer_router = ReviewerRouter(parse_pools(os.environ.get("REVIEWER_POOL", "")))
 
 # Pydantic Models for request body validation
+class Highlight(BaseModel):
+    competitor: str
+    term: str
+    start: int
+    end: int
+
+class PatchEdit(BaseModel):
+    start: int
+    end: int
+    text: str
+
 class StoryOutline(BaseModel):
-    outline: str
+    # Either the full text, or a `patch` against the parent review's text
+    # together with the SHA-256 of the text it was computed from.
+    outline: Optional[str] = None
+    parent_review_id: Optional[str] = None
+    patch: Optional[List[PatchEdit]] = None
+    base_sha256: Optional[str] = None
+    # Competitor mentions flagged by the agent, as offsets into `outline`
+    highlights: List[Highlight] = []
+    # Revisions default to their parent's tenant. A `reviewer` from the tenant's
+    # pool skips routing.
+    tenant: Optional[str] = None
+    reviewer: Optional[str] = None
 
 class ReviewDecision(BaseModel):
     decision: Literal['approved', 'disapproved']
@@ -28,40 +105,275 @@ class ReviewDecision(BaseModel):
 # Setup for rendering HTML templates
 templates = Jinja2Templates(directory="templates")
 
+
+async def load_review(review_id: str, full: bool = False) -> Optional[dict]:
+    """
+    Reads a review for the polling endpoints, going through the status cache.
+    The outline of a diff revision is rebuilt once it is decided (or `full`).
+    """
+    review_data = status_cache.get(review_id)
+    cached = review_data is not None
+    if not cached:
+        review_data = await store.get(review_id)
+        if review_data is None:
+            return None
+    if review_data.get("outline") is None and (
+        full or review_data.get("status") != "pending"
+    ):
+        review_data = await with_outline(review_id, review_data)
+        cached = False
+    if not cached:
+        status_cache.set(review_id, review_data)
+    return review_data
+
+
+async def with_outline(review_id: str, review_data: dict) -> dict:
+    """Fills in `outline` for revisions stored as a diff against their parent."""
+    if review_data.get("outline") is not None:
+        return review_data
+    try:
+        chain = await load_chain(review_id, review_data, store.get)
+    except MissingRevisionError:
+        raise HTTPException(
+            status_code=410, detail="An earlier revision of this review was deleted"
+        )
+    try:
+        outline = outline_from_chain(chain)
+    except ValueError:
+        # An ancestor's text changed after this revision's patch was made.
+        raise HTTPException(
+            status_code=409,
+            detail="An earlier revision of this review no longer matches its patch",
+        )
+    return {**review_data, "outline": outline}
+
+
+async def load_parent(parent_id: str) -> Optional[Tuple[list, str]]:
+    """
+    The parent's revision chain and full text, or None if the parent (or an
+    ancestor its text depends on) no longer exists or can't be rebuilt.
+    """
+    parent_data = await store.get(parent_id)
+    if parent_data is None:
+        return None
+    try:
+        chain = await load_chain(parent_id, parent_data, store.get)
+        return chain, outline_from_chain(chain)
+    except (MissingRevisionError, ValueError):
+        return None
+
+
+def status_projection(review_data: dict, full: bool = False) -> dict:
+    """
+    While a review is pending pollers only need its status, so the outline is
+    left out until a decision exists (or `full` is requested).
+    """
+    if full or review_data.get("status") != "pending":
+        return review_data
+    return {"status": review_data.get("status"), "decision": None}
+
+
+def review_summary(review_data: dict) -> dict:
+    """The fields a listing needs; the full outline stays on the review page."""
+    outline = review_data.get("outline") or ""
+    return {
+        "review_id": review_data["review_id"],
+        "status": review_data.get("status"),
+        "tenant": review_data.get("tenant"),
+        "reviewer": review_data.get("reviewer"),
+        "created_at": review_data.get("created_at"),
+        "revision": review_data.get("revision", 1),
+        "excerpt": review_data.get("excerpt") or outline[:EXCERPT_CHARS],
+        "highlight_count": len(review_data.get("highlights") or []),
+    }
+
+
+@app.get("/reviews")
+async def list_reviews(
+    status: Optional[Literal["pending", "approved", "disapproved"]] = "pending",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    tenant: Optional[str] = None,
+    reviewer: Optional[str] = None,
+):
+    """
+    Lists reviews oldest first, pending ones by default, optionally only one
+    tenant's or one reviewer's. Pass the returned `next_cursor` as `cursor` to
+    fetch the following page.
+    """
+    try:
+        page, next_cursor = await store.list(
+            status=status, limit=limit, cursor=cursor, tenant=tenant, reviewer=reviewer
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Unknown cursor.")
+    return {
+        "reviews": [review_summary(review) for review in page],
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/dashboard", response_class=HTMLResponse)
+async def reviewer_dashboard(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    tenant: Optional[str] = None,
+    reviewer: Optional[str] = None,
+):
+    """
+    Reviewer dashboard: one page of pending reviews, oldest first, optionally
+    only one tenant's or one reviewer's.
+    """
+    try:
+        page, next_cursor = await store.list(
+            status="pending",
+            limit=limit,
+            cursor=cursor,
+            tenant=tenant,
+            reviewer=reviewer,
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Unknown cursor.")
+    filters = {"tenant": tenant, "reviewer": reviewer}
+    return templates.TemplateResponse(
+        "dashboard.html",
+        {
+            "request": request,
+            "reviews": [review_summary(review) for review in page],
+            "next_cursor": next_cursor,
+            "limit": limit,
+            "tenant": tenant,
+            "reviewer": reviewer,
+            # Pager links keep the filters.
+            "page_query": urlencode(
+                {"limit": limit, **{k: v for k, v in filters.items() if v}}
+            ),
+        },
+    )
+
+
 @app.post("/reviews")
 async def create_review(story_outline: StoryOutline):
     """
     Endpoint for the ADK agent to submit a new story outline for review.
-    Creates a document in Firestore with a 'pending' status.
+    Creates a review document with a 'pending' status.
+
+    A revision names its `parent_review_id` and may send only a `patch`
+    against the parent's text. It is stored as a diff whenever that is
+    smaller than the full text.
+
+    The review is assigned to the reviewer the agent names (who must be in
+    the tenant's pool, when it has one), or else routed within that pool: to
+    the parent's reviewer for a revision, and otherwise to the reviewer with
+    the fewest pending reviews.
     """
+    if (story_outline.outline is None) == (story_outline.patch is None):
+        raise HTTPException(
+            status_code=400, detail="Send exactly one of 'outline' or 'patch'."
+        )
+    parent = None
+    if story_outline.parent_review_id:
+        parent = await load_parent(story_outline.parent_review_id)
+    outline = story_outline.outline
+    if story_outline.patch is not None:
+        # A patch is only meaningful against exactly the text it was made from;
+        # on a conflict the agent resends the full outline.
+        if parent is None or text_sha256(parent[1]) != story_outline.base_sha256:
+            raise HTTPException(
+                status_code=409, detail="Parent text unavailable or changed."
+            )
+        try:
+            outline = apply_patch(
+                parent[1], [edit.model_dump() for edit in story_outline.patch]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # The parent's own document comes first in its revision chain.
+    parent_data = parent[0][0][1] if parent is not None else {}
+    tenant = story_outline.tenant or parent_data.get("tenant") or DEFAULT_TENANT
+    pool = reviewer_router.pool(tenant)
+    if story_outline.reviewer and pool and story_outline.reviewer not in pool:
+        # The agent emails whoever is assigned, so only pool members qualify.
+        raise HTTPException(
+            status_code=400, detail="Reviewer is not in this tenant's reviewer pool."
+        )
+    reviewer = story_outline.reviewer or await reviewer_router.assign(
+        tenant,
+        lambda email: store.count(status="pending", tenant=tenant, reviewer=email),
+        preferred=parent_data.get("reviewer"),
+    )
+
     review_id = str(uuid.uuid4())
     review_data = {
-        "outline": story_outline.outline,
+        "outline": outline,
+        "highlights": [h.model_dump() for h in story_outline.highlights],
         "status": "pending",
         "decision": None,
-        "created_at": firestore.SERVER_TIMESTAMP
+        "tenant": tenant,
+        "reviewer": reviewer,
+        "created_at": SERVER_TIMESTAMP
     }
-    db.collection("reviews").document(review_id).set(review_data)
+    if REVIEW_RETENTION_DAYS:
+        review_data["expire_at"] = datetime.now(timezone.utc) + timedelta(
+            days=float(REVIEW_RETENTION_DAYS)
+        )
+    if parent is not None:
+        parent_chain, parent_text = parent
+        revision = parent_chain[0][1].get("revision", 1) + 1
+        review_data["parent_review_id"] = story_outline.parent_review_id
+        review_data["revision"] = revision
+        patch = make_patch(parent_text, outline)
+        is_snapshot = (revision - 1) % REVISION_SNAPSHOT_INTERVAL == 0
+        if not is_snapshot and patch_size(patch) < len(outline):
+            del review_data["outline"]
+            review_data["patch"] = patch
+            review_data["excerpt"] = outline[:EXCERPT_CHARS]
+            if "expire_at" in review_data:
+                # This revision needs its ancestors until it expires itself.
+                extend = {"expire_at": review_data["expire_at"]}
+                await asyncio.gather(
+                    *(store.update(ancestor, extend) for ancestor, _ in parent_chain)
+                )
+    await store.create(review_id, review_data)
 
     # This assumes the app is running on Cloud Run and we can construct the URL
     # The base URL will need to be configured in the agent.
     # For local testing, you might need a different base URL.
     # Note: In a real app, the base URL should come from an env var.
-    return {"review_id": review_id}
+    return {"review_id": review_id, "reviewer": reviewer}
 
 @app.get("/reviews/{review_id}/view", response_class=HTMLResponse)
 async def get_review_page(request: Request, review_id: str):
     """
     Serves the HTML page for a human to review the draft.
     """
-    doc_ref = db.collection("reviews").document(review_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    review_data = await store.get(review_id)
+    if review_data is None:
         raise HTTPException(status_code=404, detail="Review not found")
+    review_data = await with_outline(review_id, review_data)
+
+    # Revisions show what changed since the version the reviewer last saw.
+    changes = None
+    parent_id = review_data.get("parent_review_id")
+    if parent_id and review_data.get("status") == "pending":
+        parent = await load_parent(parent_id)
+        if parent is not None:
+            parent_text = parent[1]
+            patch = review_data.get("patch") or make_patch(
+                parent_text, review_data["outline"]
+            )
+            changes = diff_segments(parent_text, patch)
 
     return templates.TemplateResponse(
-        "review.html", 
-        {"request": request, "review_id": review_id, "data": doc.to_dict()}
+        "review.html",
+        {
+            "request": request,
+            "review_id": review_id,
+            "data": review_data,
+            "changes": changes,
+        },
     )
 
 @app.post("/reviews/{review_id}/decide", response_class=HTMLResponse)
@@ -72,13 +384,18 @@ async def decide_on_review(
     comment: str = Form(...)
 ):
     """
-    Endpoint called by the HTML form. Updates the Firestore document with the
+    Endpoint called by the HTML form. Updates the review document with the
     decision, the (potentially edited) outline, and any comments.
     """
-    doc_ref = db.collection("reviews").document(review_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    review_data = await store.get(review_id)
+    if review_data is None:
         raise HTTPException(status_code=404, detail="Review not found")
+    # Later revisions may be stored as a diff against this outline, so a
+    # decided review must not be changed again.
+    if review_data.get("status") != "pending":
+        raise HTTPException(
+            status_code=409, detail="This review has already been decided."
+        )
 
     if decision not in ["approved", "disapproved"]:
         raise HTTPException(status_code=400, detail="Invalid decision")
@@ -87,44 +404,181 @@ async def decide_on_review(
     if decision == "disapproved" and not comment.strip():
          raise HTTPException(status_code=400, detail="Comment is required for disapproval.")
 
-    doc_ref.update({
+    # Browsers submit textareas with CRLF line ends.
+    outline = outline.replace("\r\n", "\n")
+    decision_data = {
         "status": decision,
         "decision": decision,
         "outline": outline,  # Save the potentially edited outline
         "comment": comment,  # Save the comment
-        "reviewed_at": firestore.SERVER_TIMESTAMP
-    })
+    }
+    stored_fields = dict(decision_data)
+    if "patch" in review_data:
+        # Diff revisions keep their compact form unless the reviewer edited them.
+        if (await with_outline(review_id, review_data))["outline"] == outline:
+            del stored_fields["outline"]
+    await store.update(review_id, {**stored_fields, "reviewed_at": SERVER_TIMESTAMP})
+    status_cache.invalidate(review_id)
+
+    # Wake any agent waiting on this review so it doesn't need another read.
+    notifier.publish(review_id, {**review_data, **decision_data})
 
     return HTMLResponse(content=f"<h1>Thank you!</h1><p>Your decision ('{decision}') has been recorded.</p>")
 
 @app.get("/reviews/{review_id}/status")
-async def get_review_status(review_id: str):
+async def get_review_status(request: Request, review_id: str, full: bool = False):
     """
     A simple endpoint for the ADK agent to poll the status of the review.
-    Now returns the full review data.
+    Returns only the status while pending and the full review data (status,
+    comments and final outline) once decided, or always with `full=true`.
+    Supports conditional requests: a matching `If-None-Match` gets a 304.
+    """
+    review_data = await load_review(review_id, full)
+    if review_data is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+
+    body = jsonable_encoder(status_projection(review_data, full))
+    etag = compute_etag(body)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body, headers={"ETag": etag})
+
+
+@app.get("/reviews/{review_id}/wait")
+async def wait_for_review_decision(
+    review_id: str, timeout: float = Query(20.0, ge=0, le=MAX_WAIT_SECONDS)
+):
+    """
+    Long-poll variant of the status endpoint. Returns as soon as the review is
+    decided, or the pending status once `timeout` seconds have passed.
+    """
+    future = notifier.subscribe(review_id)
+    review_data = await load_review(review_id)
+    if review_data is None:
+        notifier.unsubscribe(review_id, future)
+        raise HTTPException(status_code=404, detail="Review not found")
+
+    if review_data.get("status") != "pending" or timeout == 0:
+        notifier.unsubscribe(review_id, future)
+        return status_projection(review_data)
+
+    decided_data = await notifier.wait(review_id, future, timeout)
+    return decided_data if decided_data is not None else status_projection(review_data)
+
+
+@app.get("/reviews/{review_id}/events")
+async def stream_review_events(review_id: str):
+    """
+    Server-Sent Events channel for a review. Emits the current status, then a
+    single `decision` event once the review is decided, and closes the stream.
     """
-    doc_ref = db.collection("reviews").document(review_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    future = notifier.subscribe(review_id)
+    review_data = await store.get(review_id)
+    if review_data is None:
+        notifier.unsubscribe(review_id, future)
         raise HTTPException(status_code=404, detail="Review not found")
+    if review_data.get("status") != "pending":
+        try:
+            review_data = await with_outline(review_id, review_data)
+        except HTTPException:
+            notifier.unsubscribe(review_id, future)
+            raise
+
+    def format_event(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def event_stream():
+        try:
+            if review_data.get("status") != "pending":
+                yield format_event("decision", review_data)
+                return
+            yield format_event("status", {"status": review_data.get("status")})
+            while True:
+                try:
+                    decided_data = await asyncio.wait_for(
+                        asyncio.shield(future), SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event("decision", decided_data)
+                return
+        finally:
+            notifier.unsubscribe(review_id, future)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
-    # Return the entire document data so the agent can access status, comments, and the final outline
-    return doc.to_dict()
+def created_before(review_data: dict, moment: datetime) -> bool:
+    created_at = review_data["created_at"]
+    # The SQLite store returns timestamps as ISO strings.
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return created_at < moment
+
+
+async def detach_revisions(older_than: datetime) -> int:
+    """
+    Writes the full text into every newer revision stored as a diff against a
+    review created before `older_than`, so deleting those reviews doesn't
+    leave it unreadable. Returns the number of revisions rewritten.
+    """
+    detached = 0
+    for review_id, revision in await store.diff_revisions(since=older_than):
+        parent_data = await store.get(revision["parent_review_id"])
+        if parent_data is not None and not created_before(parent_data, older_than):
+            # The parent stays; if its own parent goes, it is detached itself.
+            continue
+        review_data = await store.get(review_id)
+        if review_data is None:
+            continue
+        try:
+            review_data = await with_outline(review_id, review_data)
+        except HTTPException:
+            # Already unreadable; nothing left to preserve.
+            continue
+        await store.update(
+            review_id, {"outline": review_data["outline"], "patch": None}
+        )
+        status_cache.invalidate(review_id)
+        detached += 1
+    return detached
 
 
 @app.get("/admin/clear-all-reviews")
-async def clear_all_reviews():
+async def clear_all_reviews(
+    older_than_hours: Optional[float] = Query(None, gt=0),
+    progress: bool = False,
+):
     """
-    Deletes all documents in the 'reviews' collection.
+    Deletes reviews from the store (batched writes on Firestore).
+
+    `older_than_hours` limits deletion to reviews created before that age.
+    Newer revisions stored as a diff against a deleted review get their full
+    text first.
+    With `progress=true` the response is a stream of NDJSON progress lines.
 
     USE WITH CAUTION. This is for demonstration purposes.
     """
-    reviews_collection = db.collection("reviews")
-    docs = reviews_collection.stream()
+    older_than = None
+    if older_than_hours is not None:
+        older_than = datetime.now(timezone.utc) - timedelta(hours=older_than_hours)
+        # Newer revisions keep their text when the reviews they patch are deleted.
+        await detach_revisions(older_than)
+    deletions = store.delete_many(older_than)
+
+    if progress:
+        async def progress_stream():
+            deleted_count = 0
+            async for deleted_count in deletions:
+                yield json.dumps({"deleted": deleted_count}) + "\n"
+            yield json.dumps({"deleted": deleted_count, "done": True}) + "\n"
+
+        return StreamingResponse(progress_stream(), media_type="application/x-ndjson")
+
     deleted_count = 0
-    for doc in docs:
-        doc.reference.delete()
-        deleted_count += 1
+    async for deleted_count in deletions:
+        pass
     return {"message": f"Successfully deleted {deleted_count} reviews."}
 
 
@@ -0,0 +1,48 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+
+class ReviewNotifier:
+    """
+    In-process fan-out of review decisions to long-poll and SSE waiters.
+
+    Waiters are keyed by review ID. `publish` is called from the decision
+    handler and wakes every waiter for that review on this instance. Waiters on
+    other instances simply time out and fall back to a fresh read.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Future]] = defaultdict(set)
+
+    def subscribe(self, review_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[review_id].add(future)
+        return future
+
+    def unsubscribe(self, review_id: str, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(review_id)
+        if waiters is None:
+            return
+        waiters.discard(future)
+        if not waiters:
+            del self._waiters[review_id]
+
+    async def wait(
+        self, review_id: str, future: asyncio.Future, timeout: float
+    ) -> Optional[Dict[str, Any]]:
+        """Waits for a published decision, returning None on timeout."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.unsubscribe(review_id, future)
+
+    def publish(self, review_id: str, review_data: Dict[str, Any]) -> int:
+        """Wakes all waiters for the review. Returns the number notified."""
+        waiters = self._waiters.pop(review_id, set())
+        for future in waiters:
+            if not future.done():
+                future.set_result(review_data)
+        return len(waiters)
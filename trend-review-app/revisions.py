@@ -0,0 +1,112 @@
+import difflib
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# A patch is a list of edits against the parent's lines (`str.splitlines` with
+# line ends kept): lines[start:end] are replaced by `text`. Edits are sorted and
+# don't overlap. Maps rather than tuples because Firestore can't store nested
+# arrays.
+Patch = List[Dict[str, Any]]
+# (kind, text) pairs for the review page: equal, delete, insert or skip.
+Segment = Tuple[str, str]
+# Rough per-edit overhead of the JSON encoding, used to compare sizes.
+EDIT_OVERHEAD_CHARS = 32
+
+ReviewLoader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class MissingRevisionError(LookupError):
+    """Raised when a revision's text can't be rebuilt because an ancestor is gone."""
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_patch(old: str, new: str) -> Patch:
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        {"start": i1, "end": i2, "text": "".join(new_lines[j1:j2])}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_patch(old: str, patch: Patch) -> str:
+    lines = old.splitlines(keepends=True)
+    parts: List[str] = []
+    position = 0
+    for edit in patch:
+        start, end = edit["start"], edit["end"]
+        if not position <= start <= end <= len(lines):
+            raise ValueError("Patch does not apply to the parent text.")
+        parts.extend(lines[position:start])
+        parts.append(edit["text"])
+        position = end
+    parts.extend(lines[position:])
+    return "".join(parts)
+
+
+def patch_size(patch: Patch) -> int:
+    """Approximate stored size of a patch, in characters."""
+    return sum(len(edit["text"]) + EDIT_OVERHEAD_CHARS for edit in patch)
+
+
+def diff_segments(old: str, patch: Patch, context_lines: int = 3) -> List[Segment]:
+    """
+    Splits the parent text and a patch into segments for an inline diff.
+    Unchanged runs longer than twice `context_lines` are shortened to their
+    first and last lines around a `skip` segment.
+    """
+    lines = old.splitlines(keepends=True)
+    segments: List[Segment] = []
+
+    def add_equal(start: int, end: int) -> None:
+        if end - start > 2 * context_lines:
+            head_end = start + context_lines if segments else start
+            tail_start = end - context_lines if end < len(lines) else end
+            if head_end > start:
+                segments.append(("equal", "".join(lines[start:head_end])))
+            segments.append(("skip", f"{tail_start - head_end} unchanged lines"))
+            if end > tail_start:
+                segments.append(("equal", "".join(lines[tail_start:end])))
+        elif end > start:
+            segments.append(("equal", "".join(lines[start:end])))
+
+    position = 0
+    for edit in patch:
+        add_equal(position, edit["start"])
+        if edit["end"] > edit["start"]:
+            segments.append(("delete", "".join(lines[edit["start"] : edit["end"]])))
+        if edit["text"]:
+            segments.append(("insert", edit["text"]))
+        position = edit["end"]
+    add_equal(position, len(lines))
+    return segments
+
+
+async def load_chain(
+    review_id: str, review: Dict[str, Any], load: ReviewLoader
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Returns (review_id, review) pairs from `review` back to the nearest
+    ancestor that stores its full `outline`.
+    """
+    chain = [(review_id, review)]
+    while review.get("outline") is None:
+        parent_id = review.get("parent_review_id")
+        review = await load(parent_id) if parent_id else None
+        if review is None:
+            raise MissingRevisionError(parent_id or review_id)
+        chain.append((parent_id, review))
+    return chain
+
+
+def outline_from_chain(chain: List[Tuple[str, Dict[str, Any]]]) -> str:
+    """Applies each revision's patch, oldest first, to the chain's full text."""
+    text = chain[-1][1]["outline"]
+    for _, review in reversed(chain[:-1]):
+        text = apply_patch(text, review["patch"])
+    return text
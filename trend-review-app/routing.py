@@ -0,0 +1,61 @@
+import asyncio
+import json
+import random
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Pool key that applies to tenants without a pool of their own.
+ANY_TENANT = "*"
+
+
+def parse_pools(value: str) -> Dict[str, List[str]]:
+    """
+    Reviewer pools from `REVIEWER_POOL`: either a comma-separated list of
+    emails shared by every tenant, or a JSON object mapping tenants to lists
+    of emails (with "*" for any other tenant).
+    """
+    value = value.strip()
+    if not value:
+        return {}
+    if value.startswith("{"):
+        pools = json.loads(value)
+        return {
+            tenant: [email.strip() for email in emails if email.strip()]
+            for tenant, emails in pools.items()
+        }
+    return {ANY_TENANT: [email.strip() for email in value.split(",") if email.strip()]}
+
+
+class ReviewerRouter:
+    """
+    Assigns new reviews to the reviewer in the tenant's pool with the fewest
+    pending reviews. Ties are broken at random so instances that read the same
+    counts at the same time spread their reviews.
+    """
+
+    def __init__(self, pools: Dict[str, List[str]]):
+        self._pools = pools
+
+    def pool(self, tenant: str) -> List[str]:
+        return self._pools.get(tenant) or self._pools.get(ANY_TENANT) or []
+
+    async def assign(
+        self,
+        tenant: str,
+        pending_count: Callable[[str], Awaitable[int]],
+        preferred: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        The reviewer for a new review, or None when the tenant has no pool.
+        `preferred` (the reviewer of the previous revision) is kept while it
+        is still in the pool.
+        """
+        pool = self.pool(tenant)
+        if preferred is not None and preferred in pool:
+            return preferred
+        if len(pool) <= 1:
+            return pool[0] if pool else None
+        counts = await asyncio.gather(*(pending_count(email) for email in pool))
+        fewest = min(counts)
+        return random.choice(
+            [email for email, count in zip(pool, counts) if count == fewest]
+        )
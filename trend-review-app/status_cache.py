@@ -0,0 +1,51 @@
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+def compute_etag(data: Dict[str, Any]) -> str:
+    """Weak ETag over the JSON form of a response body."""
+    payload = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return f'W/"{hashlib.sha1(payload).hexdigest()}"'
+
+
+class StatusCache:
+    """
+    Short-lived in-process cache of review documents for the polling
+    endpoints. The decision handler refreshes entries on this instance; the
+    TTL bounds how stale another instance's view of a decision can be.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(review_id)
+        if entry is None:
+            return None
+        expires_at, review_data = entry
+        if expires_at < time.monotonic():
+            del self._entries[review_id]
+            return None
+        return review_data
+
+    def set(self, review_id: str, review_data: Dict[str, Any]) -> None:
+        if self._ttl <= 0:
+            return
+        if len(self._entries) >= self._max_entries:
+            self._evict_expired()
+            if len(self._entries) >= self._max_entries:
+                # Still full: drop the oldest insertion.
+                del self._entries[next(iter(self._entries))]
+        self._entries[review_id] = (time.monotonic() + self._ttl, review_data)
+
+    def invalidate(self, review_id: str) -> None:
+        self._entries.pop(review_id, None)
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        for review_id in [k for k, (exp, _) in self._entries.items() if exp < now]:
+            del self._entries[review_id]
@@ -0,0 +1,538 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Placeholder for "time of the write". Firestore resolves it server-side; the
+# local backends substitute the current UTC time.
+SERVER_TIMESTAMP = object()
+
+# Firestore allows at most 500 writes per batch.
+DELETE_BATCH_SIZE = 500
+# Batches committed in parallel while the next page is being read.
+MAX_CONCURRENT_COMMITS = 8
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a listing cursor doesn't name an existing review."""
+
+
+def _filters(**fields: Optional[str]) -> Dict[str, str]:
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+def _resolve_timestamps(data: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    return {
+        key: now if value is SERVER_TIMESTAMP else value for key, value in data.items()
+    }
+
+
+class ReviewStore(ABC):
+    """
+    Storage for review documents. Documents are plain dicts; listings filter
+    on status, tenant and reviewer, are ordered oldest first and are paged
+    with an opaque cursor (the last review ID of the previous page). Every
+    backend raises `InvalidCursorError` for a cursor naming no review.
+    """
+
+    @abstractmethod
+    async def create(self, review_id: str, data: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def update(self, review_id: str, fields: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Returns a page of reviews (each with `review_id`) and the next cursor."""
+
+    @abstractmethod
+    async def count(
+        self,
+        status: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> int:
+        """Number of reviews matching the filters, counted from the index."""
+
+    @abstractmethod
+    async def diff_revisions(
+        self, since: datetime
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        (review_id, review) pairs of the revisions created at or after `since`
+        that are stored as a patch. Each review has at least `parent_review_id`.
+        """
+
+    @abstractmethod
+    async def delete(self, review_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_many(
+        self, older_than: Optional[datetime] = None
+    ) -> AsyncIterator[int]:
+        """Deletes reviews, yielding the running count of deleted documents."""
+
+
+class InMemoryReviewStore(ReviewStore):
+    """Process-local store for tests, benchmarks and single-instance demos."""
+
+    def __init__(self):
+        self._reviews: Dict[str, Dict[str, Any]] = {}
+
+    async def create(self, review_id: str, data: Dict[str, Any]) -> None:
+        self._reviews[review_id] = _resolve_timestamps(data)
+
+    async def get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        review = self._reviews.get(review_id)
+        return dict(review) if review is not None else None
+
+    async def update(self, review_id: str, fields: Dict[str, Any]) -> None:
+        if review_id not in self._reviews:
+            raise KeyError(review_id)
+        self._reviews[review_id].update(_resolve_timestamps(fields))
+
+    def _matching(self, filters: Dict[str, str]) -> List[Tuple[Any, str]]:
+        return [
+            (review["created_at"], review_id)
+            for review_id, review in self._reviews.items()
+            if all(review.get(key) == value for key, value in filters.items())
+        ]
+
+    async def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        ordered = sorted(
+            self._matching(_filters(status=status, tenant=tenant, reviewer=reviewer))
+        )
+        if cursor is not None:
+            if cursor not in self._reviews:
+                raise InvalidCursorError(cursor)
+            after = (self._reviews[cursor]["created_at"], cursor)
+            ordered = [key for key in ordered if key > after]
+        page = [
+            {**self._reviews[review_id], "review_id": review_id}
+            for _, review_id in ordered[:limit]
+        ]
+        next_cursor = page[-1]["review_id"] if len(ordered) > limit else None
+        return page, next_cursor
+
+    async def count(
+        self,
+        status: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> int:
+        return len(
+            self._matching(_filters(status=status, tenant=tenant, reviewer=reviewer))
+        )
+
+    async def diff_revisions(
+        self, since: datetime
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        return [
+            (review_id, dict(review))
+            for review_id, review in self._reviews.items()
+            if review["created_at"] >= since and review.get("patch") is not None
+        ]
+
+    async def delete(self, review_id: str) -> bool:
+        return self._reviews.pop(review_id, None) is not None
+
+    async def delete_many(
+        self, older_than: Optional[datetime] = None
+    ) -> AsyncIterator[int]:
+        doomed = [
+            review_id
+            for review_id, review in self._reviews.items()
+            if older_than is None or review["created_at"] < older_than
+        ]
+        for review_id in doomed:
+            del self._reviews[review_id]
+        yield len(doomed)
+
+
+class SQLiteReviewStore(ReviewStore):
+    """
+    SQLite store in WAL mode so readers never wait on the writer. Each worker
+    thread keeps its own connection; calls run via `asyncio.to_thread`.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS reviews (
+                    review_id TEXT PRIMARY KEY,
+                    status TEXT,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    tenant TEXT,
+                    reviewer TEXT
+                );
+                """
+            )
+            # Databases created before reviews had a tenant and a reviewer.
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(reviews)")}
+            for column in ("tenant", "reviewer"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE reviews ADD COLUMN {column} TEXT")
+            conn.executescript(
+                """
+                CREATE INDEX IF NOT EXISTS reviews_status_created
+                    ON reviews (status, created_at, review_id);
+                CREATE INDEX IF NOT EXISTS reviews_created
+                    ON reviews (created_at, review_id);
+                CREATE INDEX IF NOT EXISTS reviews_tenant_status_created
+                    ON reviews (tenant, status, created_at, review_id);
+                CREATE INDEX IF NOT EXISTS reviews_reviewer_status_created
+                    ON reviews (reviewer, status, created_at, review_id);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(data: Dict[str, Any]) -> str:
+        return json.dumps(data, default=lambda value: value.isoformat())
+
+    async def _run(self, func, *args):
+        return await asyncio.to_thread(func, *args)
+
+    def _create(self, review_id: str, data: Dict[str, Any]) -> None:
+        data = _resolve_timestamps(data)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO reviews "
+                "(review_id, status, created_at, data, tenant, reviewer) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    review_id,
+                    data.get("status"),
+                    data["created_at"].isoformat(),
+                    self._encode(data),
+                    data.get("tenant"),
+                    data.get("reviewer"),
+                ),
+            )
+
+    async def create(self, review_id: str, data: Dict[str, Any]) -> None:
+        await self._run(self._create, review_id, data)
+
+    def _get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        row = (
+            self._connect()
+            .execute("SELECT data FROM reviews WHERE review_id = ?", (review_id,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    async def get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, review_id)
+
+    def _update(self, review_id: str, fields: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            # Take the write lock before reading so concurrent updates can't
+            # overwrite each other's fields.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT data FROM reviews WHERE review_id = ?", (review_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(review_id)
+            data = {**json.loads(row[0]), **_resolve_timestamps(fields)}
+            conn.execute(
+                "UPDATE reviews SET status = ?, data = ?, tenant = ?, reviewer = ? "
+                "WHERE review_id = ?",
+                (
+                    data.get("status"),
+                    self._encode(data),
+                    data.get("tenant"),
+                    data.get("reviewer"),
+                    review_id,
+                ),
+            )
+
+    async def update(self, review_id: str, fields: Dict[str, Any]) -> None:
+        await self._run(self._update, review_id, fields)
+
+    @staticmethod
+    def _where(filters: Dict[str, str]) -> Tuple[List[str], List[Any]]:
+        # Filter names are fixed by the callers and match column names.
+        return [f"{key} = ?" for key in filters], list(filters.values())
+
+    def _list(
+        self, filters: Dict[str, str], limit: int, cursor: Optional[str]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        conn = self._connect()
+        clauses, params = self._where(filters)
+        if cursor is not None:
+            after = conn.execute(
+                "SELECT created_at FROM reviews WHERE review_id = ?", (cursor,)
+            ).fetchone()
+            if after is None:
+                raise InvalidCursorError(cursor)
+            clauses.append("(created_at, review_id) > (?, ?)")
+            params.extend([after[0], cursor])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = conn.execute(
+            f"SELECT review_id, data FROM reviews {where} "
+            "ORDER BY created_at, review_id LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        page = [{**json.loads(data), "review_id": rid} for rid, data in rows[:limit]]
+        next_cursor = page[-1]["review_id"] if len(rows) > limit else None
+        return page, next_cursor
+
+    async def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        filters = _filters(status=status, tenant=tenant, reviewer=reviewer)
+        return await self._run(self._list, filters, limit, cursor)
+
+    def _count(self, filters: Dict[str, str]) -> int:
+        clauses, params = self._where(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        row = (
+            self._connect()
+            .execute(f"SELECT COUNT(*) FROM reviews {where}", params)
+            .fetchone()
+        )
+        return row[0]
+
+    async def count(
+        self,
+        status: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> int:
+        filters = _filters(status=status, tenant=tenant, reviewer=reviewer)
+        return await self._run(self._count, filters)
+
+    def _diff_revisions(self, since: datetime) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT review_id, data FROM reviews WHERE created_at >= ?"
+                " AND json_extract(data, '$.patch') IS NOT NULL",
+                (since.isoformat(),),
+            )
+            .fetchall()
+        )
+        return [(review_id, json.loads(data)) for review_id, data in rows]
+
+    async def diff_revisions(
+        self, since: datetime
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        return await self._run(self._diff_revisions, since)
+
+    def _delete(self, review_id: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM reviews WHERE review_id = ?", (review_id,)
+            )
+            return cursor.rowcount > 0
+
+    async def delete(self, review_id: str) -> bool:
+        return await self._run(self._delete, review_id)
+
+    def _delete_older_than(self, older_than: Optional[datetime]) -> int:
+        with self._connect() as conn:
+            if older_than is None:
+                return conn.execute("DELETE FROM reviews").rowcount
+            return conn.execute(
+                "DELETE FROM reviews WHERE created_at < ?", (older_than.isoformat(),)
+            ).rowcount
+
+    async def delete_many(
+        self, older_than: Optional[datetime] = None
+    ) -> AsyncIterator[int]:
+        yield await self._run(self._delete_older_than, older_than)
+
+
+class FirestoreReviewStore(ReviewStore):
+    """Firestore-backed store using the async client."""
+
+    def __init__(self, collection_name: str = "reviews"):
+        # Imported here so the local backends run without the GCP SDK.
+        from google.cloud import firestore
+
+        self._firestore = firestore
+        # On Cloud Run, this will automatically use the runtime service account.
+        self._db = firestore.AsyncClient()
+        self._collection = self._db.collection(collection_name)
+
+    def _prepare(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        server_timestamp = self._firestore.SERVER_TIMESTAMP
+        return {
+            key: server_timestamp if value is SERVER_TIMESTAMP else value
+            for key, value in data.items()
+        }
+
+    async def create(self, review_id: str, data: Dict[str, Any]) -> None:
+        await self._collection.document(review_id).set(self._prepare(data))
+
+    async def get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self._collection.document(review_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def update(self, review_id: str, fields: Dict[str, Any]) -> None:
+        await self._collection.document(review_id).update(self._prepare(fields))
+
+    def _query(self, filters: Dict[str, str]):
+        query = self._collection
+        for key, value in filters.items():
+            query = query.where(filter=self._firestore.FieldFilter(key, "==", value))
+        return query
+
+    async def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        filters = _filters(status=status, tenant=tenant, reviewer=reviewer)
+        query = self._query(filters).order_by("created_at").limit(limit + 1)
+        if cursor is not None:
+            cursor_doc = await self._collection.document(cursor).get()
+            if not cursor_doc.exists:
+                raise InvalidCursorError(cursor)
+            query = query.start_after(cursor_doc)
+        docs = await query.get()
+        page = [{**doc.to_dict(), "review_id": doc.id} for doc in docs[:limit]]
+        next_cursor = page[-1]["review_id"] if len(docs) > limit else None
+        return page, next_cursor
+
+    async def count(
+        self,
+        status: Optional[str] = None,
+        tenant: Optional[str] = None,
+        reviewer: Optional[str] = None,
+    ) -> int:
+        # An aggregation query reads index entries only, not the documents.
+        filters = _filters(status=status, tenant=tenant, reviewer=reviewer)
+        results = await self._query(filters).count().get()
+        return int(results[0][0].value)
+
+    async def diff_revisions(
+        self, since: datetime
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        # Firestore can't filter on a field being present, so recent revisions
+        # are read with only the fields needed to tell diffs apart.
+        query = self._collection.where(
+            filter=self._firestore.FieldFilter("created_at", ">=", since)
+        ).select(["parent_review_id", "patch"])
+        revisions = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            if data.get("parent_review_id") and data.get("patch") is not None:
+                revisions.append((doc.id, data))
+        return revisions
+
+    async def delete(self, review_id: str) -> bool:
+        doc_ref = self._collection.document(review_id)
+        if not (await doc_ref.get()).exists:
+            return False
+        await doc_ref.delete()
+        return True
+
+    async def delete_many(
+        self, older_than: Optional[datetime] = None
+    ) -> AsyncIterator[int]:
+        """
+        Deletes page by page with batched writes. Pages are read with a cursor
+        and only fetch `created_at`. Up to `MAX_CONCURRENT_COMMITS` batches are
+        committed while the next page loads.
+        """
+        query = self._collection.select(["created_at"])
+        if older_than is not None:
+            query = query.where(
+                filter=self._firestore.FieldFilter("created_at", "<", older_than)
+            ).order_by("created_at")
+
+        async def commit(batch, size: int) -> int:
+            await batch.commit()
+            return size
+
+        deleted = 0
+        last_doc = None
+        pending = set()
+        while True:
+            page_query = query.limit(DELETE_BATCH_SIZE)
+            if last_doc is not None:
+                page_query = page_query.start_after(last_doc)
+            docs = await page_query.get()
+            if docs:
+                batch = self._db.batch()
+                for doc in docs:
+                    batch.delete(doc.reference)
+                pending.add(asyncio.create_task(commit(batch, len(docs))))
+                last_doc = docs[-1]
+            last_page = len(docs) < DELETE_BATCH_SIZE
+
+            if pending and (last_page or len(pending) >= MAX_CONCURRENT_COMMITS):
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.ALL_COMPLETED
+                    if last_page
+                    else asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    deleted += task.result()
+                    yield deleted
+            if last_page:
+                break
+
+
+def create_store() -> ReviewStore:
+    """
+    Builds the store selected by `REVIEW_STORAGE_BACKEND`: `firestore`
+    (default), `sqlite` (path from `REVIEW_SQLITE_PATH`) or `memory`.
+    """
+    backend = os.environ.get("REVIEW_STORAGE_BACKEND", "firestore").lower()
+    if backend == "firestore":
+        return FirestoreReviewStore()
+    if backend == "sqlite":
+        return SQLiteReviewStore(os.environ.get("REVIEW_SQLITE_PATH", "reviews.db"))
+    if backend == "memory":
+        return InMemoryReviewStore()
+    raise ValueError(f"Unknown REVIEW_STORAGE_BACKEND: {backend}")
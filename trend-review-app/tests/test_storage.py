@@ -0,0 +1,62 @@
+"""
+Listing behaviour shared by the local storage backends.
+
+Run from the `trend-review-app` folder:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import InMemoryReviewStore, InvalidCursorError, SQLiteReviewStore
+
+
+class ListCursorTests:
+    """Mixed into one test case per backend; `make_store` builds an empty store."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    async def asyncSetUp(self):
+        self.store = self.make_store()
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for i in range(5):
+            await self.store.create(
+                f"review-{i}",
+                {"status": "pending", "created_at": start + timedelta(minutes=i)},
+            )
+
+    async def test_pages_follow_the_cursor(self):
+        page, cursor = await self.store.list(status="pending", limit=2)
+        seen = [review["review_id"] for review in page]
+        while cursor is not None:
+            page, cursor = await self.store.list(
+                status="pending", limit=2, cursor=cursor
+            )
+            seen += [review["review_id"] for review in page]
+        self.assertEqual(seen, [f"review-{i}" for i in range(5)])
+
+    async def test_unknown_cursor_is_rejected(self):
+        with self.assertRaises(InvalidCursorError):
+            await self.store.list(status="pending", limit=2, cursor="missing")
+
+
+class InMemoryListTests(ListCursorTests, unittest.IsolatedAsyncioTestCase):
+    def make_store(self):
+        return InMemoryReviewStore()
+
+
+class SQLiteListTests(ListCursorTests, unittest.IsolatedAsyncioTestCase):
+    def make_store(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return SQLiteReviewStore(os.path.join(directory.name, "reviews.db"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+
+from fastapi import Request
+from opentelemetry import propagate, trace
+
+# Span export: "console", "file" (JSON lines at TRACE_FILE_PATH) or unset (off).
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "").lower()
+TRACE_FILE_PATH = os.environ.get("TRACE_FILE_PATH", "trend-review-app-traces.jsonl")
+
+tracer = trace.get_tracer("trend-review-app")
+
+
+def configure_tracing() -> None:
+    """Installs the exporter selected by `TRACE_EXPORTER`, if any."""
+    if not TRACE_EXPORTER:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if TRACE_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACE_EXPORTER == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(TRACE_FILE_PATH, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {TRACE_EXPORTER}")
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "trend-review-app"})
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+async def trace_requests(request: Request, call_next):
+    """
+    HTTP middleware: one server span per request, continuing the caller's
+    trace when it sends a `traceparent` header. For streaming responses the
+    span ends once the response starts, not when the stream closes.
+    """
+    with tracer.start_as_current_span(
+        f"{request.method} {request.url.path}",
+        context=propagate.extract(request.headers),
+        kind=trace.SpanKind.SERVER,
+        attributes={"http.request.method": request.method},
+    ) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            # Name by route template so spans group across review IDs.
+            span.update_name(f"{request.method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        return response